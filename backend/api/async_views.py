@@ -0,0 +1,188 @@
+"""
+Hot read endpoints for the ASGI server, written with the async ORM and the
+async cache API, so a worker serves other requests while one waits.
+They answer GET with the same data, cache entries and headers as the
+viewsets. Other methods, the browsable API and cursor pagination are
+passed to the synchronous viewsets of the same URLs.
+"""
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import (parse_etags, patch_cache_control,
+                                patch_vary_headers)
+from django.views import View
+from django_filters.utils import translate_validation
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.renderers import JSONRenderer
+
+from api import payloads, serializers
+from api.filters import RecipeFilter
+from api.mixins import response_cache_key
+from api.pagintation import CustomPagination, apaginate
+from cookingcrafts.constants import Common as C
+from recipes import autocomplete
+from recipes.cache import (aget_recipe_versions, aget_recipes_version,
+                           aget_reference_data)
+from recipes.models import Recipe
+from users.authentication import CachedTokenAuthentication, aauthenticate
+
+
+class AsyncReadView(View):
+    # View of the viewset answering everything but covered GET requests,
+    # given to as_view()
+    sync_view = None
+    renderer = JSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Token authentication does not use CSRF, as in DRF views
+        view.csrf_exempt = True
+        return view
+
+    def covers(self, request):
+        return (request.GET.get('format', 'json') == 'json'
+                and 'text/html' not in request.headers.get('Accept', ''))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or not self.covers(request):
+            return await sync_to_async(self.sync_view)(request, *args,
+                                                       **kwargs)
+        try:
+            request.user = await aauthenticate(request)
+            return await self.get(request, *args, **kwargs)
+        except APIException as error:
+            return self.error_response(error)
+
+    def json_response(self, data, status=status.HTTP_200_OK):
+        response = HttpResponse(self.renderer.render(data), status=status,
+                                content_type=self.renderer.media_type)
+        # Content negotiation of the viewsets
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+    def error_response(self, error):
+        data = error.detail
+        if not isinstance(data, (list, dict)):
+            data = {'detail': data}
+        response = self.json_response(data, status=error.status_code)
+        if error.status_code == status.HTTP_401_UNAUTHORIZED:
+            response['WWW-Authenticate'] = CachedTokenAuthentication.keyword
+        return response
+
+    @staticmethod
+    def not_modified(request, etag):
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        return etag in etags or '*' in etags
+
+
+class ReferenceDataView(AsyncReadView):
+    """Tags or ingredients, as ReferenceDataMixin serves them"""
+    items = None
+
+    async def get_data(self, request, reference):
+        return getattr(reference, self.items)
+
+    async def get(self, request, pk=None):
+        reference = await aget_reference_data()
+        if pk is None:
+            data = await self.get_data(request, reference)
+        else:
+            data = getattr(reference, f'{self.items}_by_id').get(pk)
+            if data is None:
+                raise NotFound
+        if self.not_modified(request, reference.etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = self.json_response(data)
+        response['ETag'] = reference.etag
+        return response
+
+
+class TagView(ReferenceDataView):
+    items = 'tags'
+
+
+class IngredientView(ReferenceDataView):
+    items = 'ingredients'
+
+    async def get_data(self, request, reference):
+        name = request.GET.get('name', '').strip()
+        if not name:
+            return reference.ingredients
+        ingredients = await autocomplete.asearch(name, C.AUTOCOMPLETE_LIMIT)
+        return serializers.IngredientSerializer(ingredients, many=True).data
+
+
+class RecipeReadView(AsyncReadView):
+
+    async def cached_response(self, request, render):
+        """AnonymousResponseCacheMixin.cached_response, same entries"""
+        if not request.user.is_anonymous:
+            response = self.json_response(await render())
+            patch_cache_control(response, private=True)
+            patch_vary_headers(response, ('Accept', 'Authorization'))
+            return response
+        version = await aget_recipes_version()
+        key = response_cache_key(request)
+        cache_key = f'response:{version}:{key}'
+        packed = await cache.aget(cache_key)
+        if packed is None:
+            packed = payloads.pack(await render())
+            await cache.aset(cache_key, packed, C.RESPONSE_CACHE_TIMEOUT)
+        recipe_ids = payloads.packed_ids(packed)
+        versions = await aget_recipe_versions(recipe_ids)
+        etag = payloads.etag(version, key, recipe_ids, versions)
+        if self.not_modified(request, etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = self.json_response(payloads.unpack(
+                packed, await payloads.arender(recipe_ids, request, versions)
+            ))
+        response['ETag'] = etag
+        patch_cache_control(response, public=True,
+                            max_age=C.RESPONSE_CACHE_MAX_AGE)
+        patch_vary_headers(response, ('Accept', 'Authorization'))
+        return response
+
+
+class RecipeListView(RecipeReadView):
+
+    def covers(self, request):
+        mode = request.GET.get(CustomPagination.mode_query_param)
+        return super().covers(request) and mode != 'cursor'
+
+    @staticmethod
+    def filter_queryset(request):
+        """Validation of tags and ingredients queries the database,
+        the filtered queryset is lazy"""
+        filterset = RecipeFilter(request.GET, Recipe.objects.all(),
+                                 request=request)
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        return filterset.qs
+
+    async def render(self, request):
+        queryset = await sync_to_async(self.filter_queryset)(request)
+        pagination = await apaginate(queryset.values_list('id', flat=True),
+                                     request)
+        recipes = await payloads.arender(list(pagination.page), request)
+        return pagination.get_paginated_response(recipes).data
+
+    async def get(self, request):
+        return await self.cached_response(request,
+                                          lambda: self.render(request))
+
+
+class RecipeDetailView(RecipeReadView):
+
+    async def render(self, request, pk):
+        rendered = await payloads.arender([pk], request)
+        if not rendered:
+            raise NotFound
+        return rendered[0]
+
+    async def get(self, request, pk):
+        return await self.cached_response(request,
+                                          lambda: self.render(request, pk))
@@ -1,11 +1,44 @@
+from django.conf import settings
 from rest_framework import serializers
 
 from recipes.models import Recipe
 
 
+class ImageRenditionsField(serializers.ReadOnlyField):
+    """URLs of resized copies of the image by format and width"""
+
+    def to_representation(self, renditions):
+        storage = Recipe._meta.get_field('image').storage
+        request = self.context.get('request')
+        return {
+            image_format: {
+                width: (request.build_absolute_uri(storage.url(name))
+                        if request else storage.url(name))
+                for width, name in names.items()
+            }
+            for image_format, names in renditions.items()
+        }
+
+
 class ShortRecipeSerializer(serializers.ModelSerializer):
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_renditions', 'cooking_time')
         read_only_fields = ('__all__',)
+
+
+class BatchSerializer(serializers.Serializer):
+    """Ids of a batch, duplicates are dropped keeping the order"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False
+    )
+
+    def validate_ids(self, ids):
+        if len(ids) > settings.MAX_BATCH_SIZE:
+            raise serializers.ValidationError(
+                f'Ensure this field has no more than '
+                f'{settings.MAX_BATCH_SIZE} elements.'
+            )
+        return list(dict.fromkeys(ids))
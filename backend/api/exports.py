@@ -0,0 +1,82 @@
+import csv
+import json
+
+
+class Echo:
+    """File-like object which returns written value instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListExport:
+    """
+    Streams shopping list rows one by one, so the whole document
+    is never kept in memory
+    """
+    content_type = 'text/plain'
+    extension = 'txt'
+
+    def __init__(self, ingredients):
+        self.ingredients = ingredients
+
+    def __iter__(self):
+        yield self.header()
+        for item in self.ingredients:
+            yield self.row(item)
+        yield self.footer()
+
+    def header(self):
+        return 'Products to buy to cook selected dishes:\n\n'
+
+    def row(self, item):
+        return (f"{item['ingredient__name']} - "
+                f"{item['ingredient_total']} "
+                f"{item['ingredient__measurement_unit']}\n")
+
+    def footer(self):
+        return ''
+
+
+class CSVShoppingListExport(ShoppingListExport):
+    content_type = 'text/csv'
+    extension = 'csv'
+
+    def __init__(self, ingredients):
+        super().__init__(ingredients)
+        self.writer = csv.writer(Echo())
+
+    def header(self):
+        return self.writer.writerow(('name', 'measurement_unit', 'amount'))
+
+    def row(self, item):
+        return self.writer.writerow((item['ingredient__name'],
+                                     item['ingredient__measurement_unit'],
+                                     item['ingredient_total']))
+
+
+class JSONShoppingListExport(ShoppingListExport):
+    content_type = 'application/json'
+    extension = 'json'
+
+    def __iter__(self):
+        yield '['
+        separator = ''
+        for item in self.ingredients:
+            yield separator + self.row(item)
+            separator = ','
+        yield ']'
+
+    def row(self, item):
+        return json.dumps({
+            'name': item['ingredient__name'],
+            'measurement_unit': item['ingredient__measurement_unit'],
+            'amount': item['ingredient_total'],
+        }, ensure_ascii=False)
+
+
+EXPORTS = {
+    'txt': ShoppingListExport,
+    'csv': CSVShoppingListExport,
+    'json': JSONShoppingListExport,
+}
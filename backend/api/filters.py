@@ -1,25 +1,42 @@
+from django.db.models import Count, Exists, OuterRef
 from django_filters.rest_framework import filters, FilterSet
-from rest_framework.filters import SearchFilter
 
-from recipes.models import Recipe, Tag
+from recipes import search
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
 
-
-class IngredientNameFilter(SearchFilter):
-    search_param = 'name'
+POPULAR_ORDERING = ('-favourites_count', '-id')
 
 
 class RecipeFilter(FilterSet):
     tags = filters.ModelMultipleChoiceFilter(queryset=Tag.objects.all(),
                                              field_name='tags__slug',
-                                             to_field_name='slug')
+                                             to_field_name='slug',
+                                             method='filter_tags')
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    ingredients = filters.ModelMultipleChoiceFilter(
+        queryset=Ingredient.objects.all(),
+        method='filter_ingredients'
+    )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(choices=(('popular', 'popular'),),
+                                    method='filter_ordering')
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'ingredients', 'search', 'ordering')
+
+    def filter_tags(self, queryset, name, value):
+        """Recipes with any of the tags, EXISTS keeps rows unique
+        without DISTINCT"""
+        if not value:
+            return queryset
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag__in=[tag.id for tag in value]
+        )))
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -30,3 +47,24 @@ class RecipeFilter(FilterSet):
         if value and self.request.user.is_authenticated:
             return queryset.filter(users_shoppinglist__user=self.request.user)
         return queryset
+
+    def filter_ingredients(self, queryset, name, value):
+        """Recipes containing all of the given ingredients"""
+        if not value:
+            return queryset
+        return queryset.filter(id__in=IngredientRecipe.objects.filter(
+            ingredient__in=value
+        ).values('recipe').annotate(
+            matched=Count('ingredient', distinct=True)
+        ).filter(matched=len(value)).values('recipe'))
+
+    def filter_search(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        return search.search(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        """Most favourited first, served by recipe_popular_idx"""
+        if value == 'popular':
+            return queryset.order_by(*POPULAR_ORDERING)
+        return queryset
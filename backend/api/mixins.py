@@ -0,0 +1,133 @@
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import (parse_etags, patch_cache_control,
+                                patch_vary_headers)
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from api import payloads
+from api.commomserializers import BatchSerializer
+from cookingcrafts.constants import Common as C
+from recipes.cache import get_recipe_versions, get_recipes_version
+
+
+def response_cache_key(request):
+    """Same key for DRF and plain Django requests of the URL"""
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    url = f'{request.build_absolute_uri(request.path)}?{query}'
+    return md5(url.encode()).hexdigest()
+
+
+class ReferenceDataMixin:
+    """
+    Serves tags and ingredients from the reference data cache,
+    answers 304 Not Modified if the client has the current version
+    """
+
+    def get_reference_item(self, items_by_id):
+        try:
+            return items_by_id[int(self.kwargs[self.lookup_field])]
+        except (KeyError, ValueError):
+            raise NotFound
+
+    def reference_response(self, reference, data):
+        etags = parse_etags(self.request.headers.get('If-None-Match', ''))
+        if reference.etag in etags or '*' in etags:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response['ETag'] = reference.etag
+        return response
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Caches recipe responses of safe methods for anonymous users, they are
+    the same for all of them. Ids of recipes in a response are cached
+    until the recipes version changes, recipes come from cached payloads.
+    """
+
+    def get_response_cache_key(self, request):
+        return response_cache_key(request)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            response = handler(request, *args, **kwargs)
+            patch_cache_control(response, private=True)
+            patch_vary_headers(response, ('Accept', 'Authorization'))
+            return response
+        version = get_recipes_version()
+        key = self.get_response_cache_key(request)
+        cache_key = f'response:{version}:{key}'
+        packed = cache.get(cache_key)
+        if packed is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            packed = payloads.pack(response.data)
+            cache.set(cache_key, packed, C.RESPONSE_CACHE_TIMEOUT)
+        # Payloads of a rendered response are in cache, the ETag and
+        # the data are built from the same versions
+        recipe_ids = payloads.packed_ids(packed)
+        versions = get_recipe_versions(recipe_ids)
+        etag = payloads.etag(version, key, recipe_ids, versions)
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in etags or '*' in etags:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(payloads.unpack(packed, payloads.render(
+                recipe_ids, request, versions
+            )))
+        response['ETag'] = etag
+        patch_cache_control(response, public=True,
+                            max_age=C.RESPONSE_CACHE_MAX_AGE)
+        patch_vary_headers(response, ('Accept', 'Authorization'))
+        return response
+
+
+class PairBatchMixin:
+    """
+    Adds or removes favourites, cart entries or subscriptions of the
+    requesting user for a list of ids with one statement, the response
+    has the result of every id
+    """
+    ADDED, EXISTS = 'added', 'exists'
+    REMOVED, ABSENT = 'removed', 'absent'
+    NOT_FOUND, INVALID = 'not_found', 'invalid'
+
+    def batch_response(self, model, add, invalid=()):
+        """Invalid ids are reported and never written"""
+        serializer = BatchSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        user = self.request.user
+        target = model.objects.target_field()
+        with transaction.atomic():
+            write = (model.objects.add_many if add
+                     else model.objects.remove_many)
+            rows = write(user.id, [target_id for target_id in ids
+                                   if target_id not in invalid])
+        changed = {getattr(row, target.attname) for row in rows}
+        rejected = [target_id for target_id in ids
+                    if target_id not in changed and target_id not in invalid]
+        existing = set(target.related_model.objects.filter(
+            id__in=rejected
+        ).values_list('id', flat=True)) if rejected else set()
+        done, skipped = ((self.ADDED, self.EXISTS) if add
+                         else (self.REMOVED, self.ABSENT))
+        results = []
+        for target_id in ids:
+            if target_id in invalid:
+                result = self.INVALID
+            elif target_id in changed:
+                result = done
+            elif target_id in existing:
+                result = skipped
+            else:
+                result = self.NOT_FOUND
+            results.append({'id': target_id, 'status': result})
+        return Response({'results': results})
@@ -1,8 +1,113 @@
-from rest_framework.pagination import PageNumberPagination
+from hashlib import md5
+
+from django.core.cache import cache
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.request import Request
 
 from cookingcrafts.constants import Common as C
 
 
+class CachedCountPaginator(Paginator):
+    """
+    Keeps big counts in cache for a short time,
+    small counts are cheap and always exact
+    """
+
+    @staticmethod
+    def cache_key(queryset):
+        sql, params = queryset.query.sql_with_params()
+        return 'count:' + md5(repr((sql, params)).encode()).hexdigest()
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        key = self.cache_key(self.object_list)
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            if count >= C.CACHED_COUNT_MIN:
+                cache.set(key, count, C.CACHED_COUNT_TIMEOUT)
+        return count
+
+    async def acount(self):
+        """count for async views, the same cache entries"""
+        key = self.cache_key(self.object_list)
+        count = await cache.aget(key)
+        if count is None:
+            count = await self.object_list.acount()
+            if count >= C.CACHED_COUNT_MIN:
+                await cache.aset(key, count, C.CACHED_COUNT_TIMEOUT)
+        self.count = count
+        return count
+
+
+class CustomCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    page_size = C.PAGE_SIZE
+    ordering = '-id'
+
+
 class CustomPagination(PageNumberPagination):
+    """
+    Page number pagination by default, ?pagination=cursor switches
+    to cursor pagination by id which needs neither OFFSET nor COUNT(*)
+    """
     page_size_query_param = 'limit'
     page_size = C.PAGE_SIZE
+    django_paginator_class = CachedCountPaginator
+    mode_query_param = 'pagination'
+    cursor_pagination_class = CustomCursorPagination
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.mode_query_param) == 'cursor':
+            if request.query_params.get('ordering') == 'popular':
+                # Counters change all the time and have many ties,
+                # a cursor by them would skip or repeat recipes
+                raise ValidationError({'ordering': [
+                    'Popular ordering is paginated by page number only'
+                ]})
+            if request.query_params.get('search', '').strip():
+                # Cursor is by id, it would drop the order by rank
+                raise ValidationError({'search': [
+                    'Search results are paginated by page number only'
+                ]})
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+async def apaginate(queryset, request):
+    """
+    Page by number of CustomPagination for async views, the count and the
+    page are loaded with the async ORM. Returns the pagination holding
+    the page, get_paginated_response() builds the same envelope
+    """
+    pagination = CustomPagination()
+    pagination.request = Request(request)
+    page_size = pagination.get_page_size(pagination.request)
+    paginator = pagination.django_paginator_class(queryset, page_size)
+    await paginator.acount()
+    page_number = pagination.get_page_number(pagination.request, paginator)
+    try:
+        number = paginator.validate_number(page_number)
+    except InvalidPage as error:
+        raise NotFound(pagination.invalid_page_message.format(
+            page_number=page_number, message=str(error)
+        ))
+    bottom = (number - 1) * page_size
+    objects = [obj async for obj in queryset[bottom:bottom + page_size]]
+    pagination.page = Page(objects, number, paginator)
+    return pagination
@@ -0,0 +1,203 @@
+"""
+Two layer rendering of recipes. The shared payload of a recipe is rendered
+once per version of the recipe and cached, flags of the current user are
+laid over copies of it. Anonymous users get the shared payloads.
+"""
+from hashlib import md5
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+
+from cookingcrafts.constants import Common as C
+from recipes.cache import aget_recipe_versions, get_recipe_versions
+from recipes.models import Favourite, Recipe, ShoppingList
+from users.subscriptions import afollowed_author_ids, followed_author_ids
+
+from .serializers import RecipeListRetrieveSerializer
+
+
+def _key(version, base_url, recipe_id):
+    return f'recipe_payload:{version}:{base_url}:{recipe_id}'
+
+
+def _base_url(request):
+    # Payloads contain absolute image URLs
+    return md5(request.build_absolute_uri('/').encode()).hexdigest()
+
+
+def _render_missing(recipe_ids, request, versions, base_url):
+    """Renders and caches payloads which are not in cache"""
+    anonymous = AnonymousUser()
+    recipes = Recipe.objects.with_related().with_user_flags(
+        anonymous
+    ).filter(id__in=recipe_ids)
+    context = {'request': request, 'user': anonymous}
+    rendered = {
+        recipe.id: dict(RecipeListRetrieveSerializer(
+            recipe, context=context
+        ).data)
+        for recipe in recipes
+    }
+    cache.set_many({_key(versions[recipe_id], base_url, recipe_id): payload
+                    for recipe_id, payload in rendered.items()},
+                   C.RESPONSE_CACHE_TIMEOUT)
+    return rendered
+
+
+def get_payloads(recipe_ids, request, versions=None):
+    """Shared payloads by recipe id, as anonymous users see them"""
+    if versions is None:
+        versions = get_recipe_versions(recipe_ids)
+    base_url = _base_url(request)
+    keys = {_key(versions[recipe_id], base_url, recipe_id): recipe_id
+            for recipe_id in recipe_ids}
+    payloads = {keys[key]: payload
+                for key, payload in cache.get_many(keys).items()}
+    missing = [recipe_id for recipe_id in recipe_ids
+               if recipe_id not in payloads]
+    if missing:
+        payloads.update(_render_missing(missing, request, versions,
+                                        base_url))
+    return payloads
+
+
+async def aget_payloads(recipe_ids, request, versions=None):
+    """get_payloads for async views, missing payloads are rendered by
+    the serializer in a thread, it needs prefetching"""
+    if versions is None:
+        versions = await aget_recipe_versions(recipe_ids)
+    base_url = _base_url(request)
+    keys = {_key(versions[recipe_id], base_url, recipe_id): recipe_id
+            for recipe_id in recipe_ids}
+    payloads = {keys[key]: payload
+                for key, payload in (await cache.aget_many(keys)).items()}
+    missing = [recipe_id for recipe_id in recipe_ids
+               if recipe_id not in payloads]
+    if missing:
+        payloads.update(await sync_to_async(_render_missing)(
+            missing, request, versions, base_url
+        ))
+    return payloads
+
+
+class UserFlags:
+    """Favourite, shopping cart and subscription flags of one user,
+    loaded with one query each for all recipes of a response"""
+
+    def __init__(self, favourites, shopping_cart, followed):
+        self.favourites = favourites
+        self.shopping_cart = shopping_cart
+        self.followed = followed
+
+    @staticmethod
+    def _querysets(user, payloads):
+        recipe_ids = [payload['id'] for payload in payloads]
+        return (
+            Favourite.objects.filter(
+                user=user, recipe__in=recipe_ids
+            ).values_list('recipe_id', flat=True),
+            ShoppingList.objects.filter(
+                user=user, recipe__in=recipe_ids
+            ).values_list('recipe_id', flat=True),
+        )
+
+    @classmethod
+    def load(cls, request, payloads):
+        favourites, shopping_cart = cls._querysets(request.user, payloads)
+        return cls(set(favourites), set(shopping_cart),
+                   followed_author_ids(request))
+
+    @classmethod
+    async def aload(cls, request, payloads):
+        favourites, shopping_cart = cls._querysets(request.user, payloads)
+        return cls({recipe_id async for recipe_id in favourites},
+                   {recipe_id async for recipe_id in shopping_cart},
+                   await afollowed_author_ids(request))
+
+    def apply(self, payload):
+        """Returns a copy, cached payload is shared between requests"""
+        author = payload['author']
+        return {
+            **payload,
+            'author': {**author,
+                       'is_subscribed': author['id'] in self.followed},
+            'is_favorited': payload['id'] in self.favourites,
+            'is_in_shopping_cart': payload['id'] in self.shopping_cart,
+        }
+
+
+def render(recipe_ids, request, versions=None):
+    payloads = get_payloads(recipe_ids, request, versions)
+    payloads = [payloads[recipe_id] for recipe_id in recipe_ids
+                if recipe_id in payloads]
+    if request.user.is_anonymous:
+        return payloads
+    flags = UserFlags.load(request, payloads)
+    return [flags.apply(payload) for payload in payloads]
+
+
+async def arender(recipe_ids, request, versions=None):
+    """render for async views"""
+    payloads = await aget_payloads(recipe_ids, request, versions)
+    payloads = [payloads[recipe_id] for recipe_id in recipe_ids
+                if recipe_id in payloads]
+    if request.user.is_anonymous:
+        return payloads
+    flags = await UserFlags.aload(request, payloads)
+    return [flags.apply(payload) for payload in payloads]
+
+
+def pack(data):
+    """
+    Response data with recipes replaced by their ids. Anonymous responses
+    are cached packed, so a changed recipe is rendered again only once
+    """
+    if 'results' in data:
+        return {**data, 'results': [recipe['id']
+                                    for recipe in data['results']]}
+    return data['id']
+
+
+def packed_ids(packed):
+    return packed['results'] if isinstance(packed, dict) else [packed]
+
+
+def unpack(packed, rendered):
+    if isinstance(packed, dict):
+        return {**packed, 'results': rendered}
+    if not rendered:
+        # Deleted after it was looked up
+        raise NotFound
+    return rendered[0]
+
+
+def etag(recipes_version, key, recipe_ids, versions):
+    """Changes with the list and with every recipe in it"""
+    state = (recipes_version, key,
+             [versions[recipe_id] for recipe_id in recipe_ids])
+    return f'"{md5(repr(state).encode()).hexdigest()}"'
+
+
+class RecipePayloadListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        return render([recipe.id for recipe in data],
+                      self.context['request'])
+
+
+class RecipePayloadSerializer(RecipeListRetrieveSerializer):
+    """Output of RecipeListRetrieveSerializer built from cached payloads,
+    needs only ids of recipes"""
+
+    class Meta(RecipeListRetrieveSerializer.Meta):
+        list_serializer_class = RecipePayloadListSerializer
+
+    def to_representation(self, instance):
+        rendered = render([instance.id], self.context['request'])
+        if not rendered:
+            # Deleted after it was looked up
+            raise NotFound
+        return rendered[0]
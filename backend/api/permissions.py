@@ -5,5 +5,5 @@ class IsAuthorOrAdminOrReadOnly(IsAuthenticatedOrReadOnly):
 
     def has_object_permission(self, request, view, obj):
         user = request.user
-        return (obj.author == user or request.method in SAFE_METHODS
+        return (request.method in SAFE_METHODS or obj.author == user
                 or user.is_staff or user.is_admin)
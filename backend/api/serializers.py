@@ -1,26 +1,146 @@
 import base64
-
-from django.core.files.base import ContentFile
+import binascii
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import transaction
+from PIL import Image
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 from rest_framework.validators import ValidationError
 
 from cookingcrafts.constants import Recipe as R
+from recipes import images
+from recipes.cache import (get_reference_data, invalidate_recipe_versions,
+                           invalidate_recipes)
 from recipes.models import (Favourite, Ingredient, IngredientRecipe,
-                            Recipe, ShoppingList, Tag)
+                            Recipe, ShoppingList, ShoppingListIngredient,
+                            Tag)
 from users.serializers import CustomUserSerializer
 
-from .commomserializers import ShortRecipeSerializer
+from .commomserializers import ImageRenditionsField
 
 
 class Base64ImageField(serializers.ImageField):
-    def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
+    """
+    Accepts image as base64 data URI. Payload is decoded in chunks straight
+    to a temporary file, size and pixel limits are checked before
+    the image is decoded by Pillow.
+    """
+    CHUNK_SIZE = 64 * 1024
+
+    default_error_messages = {
+        'too_large': 'Image size should not exceed {max_size:g} MB',
+        'too_many_pixels': ('Image resolution should not exceed '
+                            '{max_pixels:g} megapixels'),
+        'invalid_base64': 'Image is not a valid base64 data',
+    }
 
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+    def to_internal_value(self, data):
+        if not (isinstance(data, str) and data.startswith('data:image')):
+            return super().to_internal_value(data)
+        upload = self.decode(data)
+        self.check_pixels(upload)
+        try:
+            return super().to_internal_value(upload)
+        except ValidationError:
+            upload.close()
+            raise
+
+    def decode(self, data):
+        separator = data.find(';base64,')
+        if separator == -1:
+            self.fail('invalid_base64')
+        ext = data[len('data:image/'):separator]
+        start = separator + len(';base64,')
+        # Clients may wrap base64 at 76 columns
+        size = ((len(data) - start - data.count('\n', start)
+                 - data.count('\r', start)) * 3 // 4 - data.count('=', -2))
+        if size > settings.MAX_IMAGE_SIZE:
+            self.fail('too_large',
+                      max_size=settings.MAX_IMAGE_SIZE / 1024 / 1024)
+        # Has temporary_file_path(), so ImageField validation opens
+        # the file by path and storage moves it instead of reading it
+        upload = TemporaryUploadedFile(f'upload.{ext}', f'image/{ext}', 0,
+                                       None)
+        content_hash = sha256()
+        pending = ''
+        try:
+            for offset in range(start, len(data), self.CHUNK_SIZE):
+                # Whitespace is dropped, a tail shorter than a base64
+                # quantum waits for the next chunk
+                text = pending + ''.join(
+                    data[offset:offset + self.CHUNK_SIZE].split()
+                )
+                end = len(text) - len(text) % 4
+                pending = text[end:]
+                chunk = base64.b64decode(text[:end], validate=True)
+                content_hash.update(chunk)
+                upload.write(chunk)
+            if pending:
+                raise binascii.Error('Incomplete base64 quantum')
+        except binascii.Error:
+            upload.close()
+            self.fail('invalid_base64')
+        upload.size = upload.tell()
+        upload.seek(0)
+        # Named by content, so the same image is stored only once
+        upload.name = f'{content_hash.hexdigest()}.{ext}'
+        return upload
+
+    def check_pixels(self, upload):
+        """Reads only the image header, pixels are not decoded"""
+        try:
+            with Image.open(upload) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            width = height = settings.MAX_IMAGE_PIXELS
+        except OSError:
+            # Not an image, left for ImageField validation
+            return
+        finally:
+            upload.seek(0)
+        if width * height > settings.MAX_IMAGE_PIXELS:
+            upload.close()
+            self.fail('too_many_pixels',
+                      max_pixels=settings.MAX_IMAGE_PIXELS / 1000000)
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Fetches all related objects with one query"""
 
-        return super().to_internal_value(data)
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        queryset = self.child_relation.get_queryset()
+        to_python = queryset.model._meta.pk.to_python
+        try:
+            if any(isinstance(pk, bool) for pk in data):
+                raise ValueError
+            # '01' and 1.0 are looked up as 1, as the child field does
+            pks = [to_python(pk) for pk in data]
+            found = queryset.in_bulk(pks)
+        except (DjangoValidationError, TypeError, ValueError):
+            pks, found = [], {}
+        if not pks or any(pk not in found for pk in pks):
+            # Per-item lookups only to report which item is wrong
+            return super().to_internal_value(data)
+        return [found[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -30,6 +150,34 @@ class TagSerializer(serializers.ModelSerializer):
         model = Tag
 
 
+class ReferenceTagsField(serializers.Field):
+    """Renders recipe tags from the reference data cache"""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self.reference = None
+        self.loaded = {}
+
+    def to_representation(self, tags):
+        if self.reference is None:
+            self.reference = get_reference_data()
+        tag_ids = [tag.id for tag in tags.all()]
+        missing = [tag_id for tag_id in tag_ids
+                   if tag_id not in self.reference.tags_by_id
+                   and tag_id not in self.loaded]
+        if missing:
+            # Tags newer than the snapshot, one query for the page
+            self.loaded.update(
+                (tag['id'], tag) for tag in Tag.objects.filter(
+                    id__in=missing
+                ).values(*TagSerializer.Meta.fields)
+            )
+        found = (self.reference.tags_by_id.get(tag_id)
+                 or self.loaded.get(tag_id) for tag_id in tag_ids)
+        return [tag for tag in found if tag is not None]
+
+
 class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -46,11 +194,6 @@ class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
         model = IngredientRecipe
         fields = ('id', 'amount')
 
-    def validate_id(self, value):
-        if not Ingredient.objects.filter(id=value).exists():
-            raise ValidationError("Ingredient doesn't exists")
-        return value
-
     def validate_amount(self, value):
         if value < R.MIN_INGR_AMOUNT:
             raise ValidationError("Ingredient amount couldn't be less than "
@@ -73,30 +216,31 @@ class RecipeIngredientRetrieveSerializer(serializers.ModelSerializer):
 class RecipeListRetrieveSerializer(serializers.ModelSerializer):
     text = serializers.CharField(source='description')
     author = CustomUserSerializer()
-    tags = TagSerializer(many=True, read_only=True)
-    ingredients = serializers.SerializerMethodField()
+    tags = ReferenceTagsField()
+    ingredients = RecipeIngredientRetrieveSerializer(
+        source='recipe_ingredients', many=True, read_only=True
+    )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_renditions = ImageRenditionsField()
 
     class Meta:
-        fields = ('id', 'author', 'name', 'image', 'ingredients', 'text',
-                  'tags', 'cooking_time', 'is_favorited',
-                  'is_in_shopping_cart')
+        fields = ('id', 'author', 'name', 'image', 'image_renditions',
+                  'ingredients', 'text', 'tags', 'cooking_time',
+                  'is_favorited', 'is_in_shopping_cart')
         model = Recipe
         read_only_fields = ('__all__',)
 
-    def get_ingredients(self, obj):
-        recipe_ingredients = IngredientRecipe.objects.filter(recipe=obj)
-        return RecipeIngredientRetrieveSerializer(
-            recipe_ingredients, many=True
-        ).data
-
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         return Favourite.objects.filter(
             user=self.context['request'].user.id,
             recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         return ShoppingList.objects.filter(
             user=self.context['request'].user.id,
             recipe=obj).exists()
@@ -105,8 +249,7 @@ class RecipeListRetrieveSerializer(serializers.ModelSerializer):
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     text = serializers.CharField(source='description')
     author = CustomUserSerializer(read_only=True,)
-    tags = serializers.PrimaryKeyRelatedField(many=True,
-                                              queryset=Tag.objects.all())
+    tags = BulkPrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
     cooking_time = serializers.IntegerField(required=True,
                                             min_value=R.MIN_COOKING_TIME,
                                             max_value=R.MAX_COOKING_TIME)
@@ -125,6 +268,15 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         ingredients_ids = [ingredient['id'] for ingredient in value]
         if len(ingredients_ids) != len(set(ingredients_ids)):
             raise ValidationError('Ingredients should be unique')
+        existing = set(Ingredient.objects.filter(
+            id__in=ingredients_ids
+        ).values_list('id', flat=True))
+        if len(existing) != len(ingredients_ids):
+            raise ValidationError([
+                {} if ingredient_id in existing
+                else {'id': ["Ingredient doesn't exists"]}
+                for ingredient_id in ingredients_ids
+            ])
         return value
 
     def validate_tags(self, value):
@@ -139,6 +291,16 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             raise ValidationError('The image is not provided')
         return value
 
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            # Temporary file of the decoded image, storage has moved it
+            # or already has the same content
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
+
     @staticmethod
     def add_ingredients(recipe, ingredients):
         ingredients_array = []
@@ -149,72 +311,74 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
                 amount=ingredient['amount']))
         return IngredientRecipe.objects.bulk_create(ingredients_array)
 
+    @classmethod
+    def sync_ingredients(cls, recipe, ingredients):
+        """Writes only added, changed and removed recipe ingredients"""
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in IngredientRecipe.objects.filter(
+                recipe=recipe
+            )
+        }
+        added, changed, deltas = [], [], {}
+        for ingredient in ingredients:
+            recipe_ingredient = current.pop(ingredient['id'], None)
+            if recipe_ingredient is None:
+                added.append(ingredient)
+                deltas[ingredient['id']] = ingredient['amount']
+            elif recipe_ingredient.amount != ingredient['amount']:
+                deltas[ingredient['id']] = (ingredient['amount']
+                                            - recipe_ingredient.amount)
+                recipe_ingredient.amount = ingredient['amount']
+                changed.append(recipe_ingredient)
+        if current:
+            # post_delete takes removed ones out of shopping lists
+            IngredientRecipe.objects.filter(
+                id__in=[item.id for item in current.values()]
+            ).delete()
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ['amount'])
+        if added:
+            cls.add_ingredients(recipe, added)
+        # Bulk writes send no signals
+        ShoppingListIngredient.objects.change_recipe(recipe.id, deltas)
+        if added:
+            invalidate_recipes()
+        if deltas:
+            invalidate_recipe_versions([recipe.id])
+
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(**validated_data)
         self.add_ingredients(recipe, ingredients)
         recipe.tags.set(tags)
+        recipe.image_renditions = images.schedule(recipe.image.name)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.tags.clear()
-        instance.ingredients.clear()
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        instance.tags.set(tags)
-        self.add_ingredients(instance, ingredients)
-        instance.save()
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        if 'image' in validated_data:
+            validated_data['image_renditions'] = {}
+        instance = super().update(instance, validated_data)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self.sync_ingredients(instance, ingredients)
+        if 'image' in validated_data:
+            instance.image_renditions = images.schedule(instance.image.name)
         return instance
 
     def to_representation(self, instance):
-        context = {'request': self.context.get('request')}
+        request = self.context.get('request')
+        context = {'request': request}
+        # Same number of queries for the response as for a retrieve
+        instance = Recipe.objects.with_related().with_user_flags(
+            request.user
+        ).get(id=instance.id)
         return RecipeListRetrieveSerializer(
             instance=instance, context=context
         ).data
-
-
-class FavouriteSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Favourite
-        fields = ('user', 'recipe')
-
-    def validate(self, data):
-        user = data.get('user').id
-        recipe = data.get('recipe')
-        if Favourite.objects.filter(user=user, recipe=recipe).exists():
-            raise ValidationError(
-                'The recipe is already in your favourites'
-            )
-        return data
-
-    def create(self, validated_data):
-        user = validated_data.get('user')
-        recipe = validated_data.get('recipe')
-        return Favourite.objects.create(user=user, recipe=recipe)
-
-    def to_representation(self, instance):
-        return ShortRecipeSerializer(instance=instance.recipe).data
-
-
-class ShoppingListSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = ShoppingList
-        fields = ('user', 'recipe')
-
-    def validate(self, data):
-        user = data.get('user').id
-        recipe = data.get('recipe')
-        if ShoppingList.objects.filter(user=user, recipe=recipe).exists():
-            raise ValidationError(
-                'The recipe is already in your Shopping list'
-            )
-        return data
-
-    def create(self, validated_data):
-        user = validated_data.get('user')
-        recipe = validated_data.get('recipe')
-        return ShoppingList.objects.create(user=user, recipe=recipe)
-
-    def to_representation(self, instance):
-        return ShortRecipeSerializer(instance=instance.recipe).data
@@ -0,0 +1,46 @@
+import base64
+import textwrap
+from io import BytesIO
+
+from django.test import SimpleTestCase
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.serializers import Base64ImageField
+
+
+def png():
+    buffer = BytesIO()
+    Image.new('RGB', (32, 32), 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class Base64ImageFieldTest(SimpleTestCase):
+    """Payload is decoded in chunks as a whole base64 string would be"""
+
+    def setUp(self):
+        self.image = png()
+        self.encoded = base64.b64encode(self.image).decode()
+        self.field = Base64ImageField()
+        # Chunk boundaries fall inside lines and base64 quanta
+        self.field.CHUNK_SIZE = 10
+
+    def decoded(self, encoded):
+        upload = self.field.to_internal_value(
+            f'data:image/png;base64,{encoded}'
+        )
+        self.addCleanup(upload.close)
+        return upload.read()
+
+    def test_wrapped(self):
+        for separator in ('\n', '\r\n', ' '):
+            with self.subTest(separator=separator):
+                wrapped = separator.join(textwrap.wrap(self.encoded, 76))
+                self.assertEqual(self.decoded(wrapped), self.image)
+
+    def test_invalid(self):
+        for encoded in (self.encoded[:-1], self.encoded[:40] + '!'
+                        + self.encoded[40:], ''):
+            with self.subTest(encoded=encoded[-8:]), \
+                    self.assertRaises(ValidationError):
+                self.decoded(encoded)
@@ -0,0 +1,26 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+URL = '/api/recipes/'
+
+
+class CursorPaginationTest(TestCase):
+    """Orders other than by id are paginated by page number only"""
+
+    def test_rejected_orders(self):
+        client = APIClient()
+        for field, value in (('ordering', 'popular'), ('search', 'soup')):
+            with self.subTest(field=field):
+                response = client.get(URL, {'pagination': 'cursor',
+                                            field: value})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.data)
+                response = client.get(URL, {field: value})
+                self.assertEqual(response.status_code, 200)
+
+    def test_cursor(self):
+        response = APIClient().get(URL, {'pagination': 'cursor',
+                                         'search': ' '})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('next', response.data)
+        self.assertNotIn('count', response.data)
@@ -0,0 +1,100 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.cache import get_recipe_versions, get_recipes_version
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from users.models import User
+
+URL = '/api/recipes/'
+
+
+class RecipePayloadVersionsTest(TestCase):
+    """A change of a recipe renders only that recipe again"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(email='author@test.local',
+                                         username='author',
+                                         first_name='Test',
+                                         last_name='Author')
+        cls.tag = Tag.objects.create(name='Tag', color='#000000',
+                                     slug='tag')
+        cls.ingredient = Ingredient.objects.create(name='ingredient',
+                                                   measurement_unit='g')
+        cls.recipes = Recipe.objects.bulk_create(
+            Recipe(author=cls.author, name=f'Recipe {number}',
+                   description='Test recipe', image='recipes/test.png',
+                   cooking_time=10)
+            for number in range(3)
+        )
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient=cls.ingredient,
+                             amount=1)
+            for recipe in cls.recipes
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 200)
+        self.etag = response.headers['ETag']
+        self.recipes_version = get_recipes_version()
+        self.versions = self.recipe_versions()
+
+    def recipe_versions(self):
+        return get_recipe_versions([recipe.id for recipe in self.recipes])
+
+    def changed_recipes(self):
+        versions = self.recipe_versions()
+        return {recipe_id for recipe_id, version in versions.items()
+                if version != self.versions[recipe_id]}
+
+    def test_changed_cooking_time(self):
+        recipe = self.recipes[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.cooking_time = 20
+            recipe.save()
+        self.assertEqual(get_recipes_version(), self.recipes_version)
+        self.assertEqual(self.changed_recipes(), {recipe.id})
+        # Ids are cached, only the changed recipe is rendered
+        with self.assertNumQueries(3):
+            response = self.client.get(URL, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['cooking_time'] for item in response.data['results']
+             if item['id'] == recipe.id], [20]
+        )
+        response = self.client.get(URL,
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_changed_amount(self):
+        recipe_ingredient = IngredientRecipe.objects.get(
+            recipe=self.recipes[1]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe_ingredient.amount = 5
+            recipe_ingredient.save()
+        self.assertEqual(get_recipes_version(), self.recipes_version)
+        self.assertEqual(self.changed_recipes(), {self.recipes[1].id})
+
+    def test_changed_author(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.first_name = 'Changed'
+            self.author.save()
+        self.assertEqual(get_recipes_version(), self.recipes_version)
+        self.assertEqual(self.changed_recipes(),
+                         {recipe.id for recipe in self.recipes})
+
+    def test_changed_membership(self):
+        recipe = self.recipes[2]
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tags.add(self.tag)
+        self.assertNotEqual(get_recipes_version(), self.recipes_version)
+        self.assertEqual(self.changed_recipes(), {recipe.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.name = 'Renamed'
+            recipe.save()
+        self.assertNotEqual(get_recipes_version(), self.recipes_version)
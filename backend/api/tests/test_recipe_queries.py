@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (Favourite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingList, Tag)
+from users.models import Subscribe, User
+
+PAGE_SIZES = (1, 10, 100)
+
+
+class RecipeListQueriesTest(TestCase):
+    """List pages run the same queries whatever the page size"""
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = User.objects.bulk_create(
+            User(email=f'author{number}@test.local',
+                 username=f'author{number}', first_name='Test',
+                 last_name=f'Author{number}')
+            for number in range(10)
+        )
+        cls.user = User.objects.create(email='user@test.local',
+                                       username='user', first_name='Test',
+                                       last_name='User')
+        tags = Tag.objects.bulk_create(
+            Tag(name=f'Tag {number}', color=f'#{number:06x}',
+                slug=f'tag-{number}')
+            for number in range(3)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient {number}', measurement_unit='g')
+            for number in range(5)
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=authors[number % len(authors)],
+                   name=f'Recipe {number}', description='Test recipe',
+                   image='recipes/test.png', cooking_time=10)
+            for number in range(max(PAGE_SIZES))
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes for tag in tags[:2]
+        )
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes for ingredient in ingredients[:3]
+        )
+        for model in (Favourite, ShoppingList):
+            model.objects.bulk_create(model(user=cls.user, recipe=recipe)
+                                      for recipe in recipes[::2])
+        Subscribe.objects.create(user=cls.user, author=authors[0])
+        cls.token = Token.objects.create(user=cls.user)
+
+    def assertListQueries(self, client, queries):
+        for limit in PAGE_SIZES:
+            # Every page is rendered from the database, not from cache
+            cache.clear()
+            with self.subTest(limit=limit), self.assertNumQueries(queries):
+                response = client.get(f'/api/recipes/?limit={limit}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous_list(self):
+        # Count, page ids, payloads with tags and ingredients, and
+        # the reference data snapshot of tags and ingredients
+        self.assertListQueries(APIClient(), 7)
+
+    def test_authenticated_list(self):
+        # Token, count, page ids, the anonymous plan for payloads,
+        # favourites, shopping list and followed authors
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertListQueries(client, 11)
@@ -0,0 +1,93 @@
+import base64
+import re
+import shutil
+import tempfile
+from collections import Counter
+from io import BytesIO
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Tag
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+WRITE = re.compile(r'^(INSERT INTO|UPDATE|DELETE FROM) "(\w+)"')
+
+
+def image_payload():
+    buffer = BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_PIPELINE='queue')
+class RecipeUpdateWritesTest(TestCase):
+    """Update writes only rows which changed"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(email='user@test.local', username='user',
+                                   first_name='Test', last_name='User')
+        cls.token = Token.objects.create(user=user)
+        cls.tags = Tag.objects.bulk_create(
+            Tag(name=f'Tag {number}', color=f'#{number:06x}',
+                slug=f'tag-{number}')
+            for number in range(2)
+        )
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient {number}', measurement_unit='g')
+            for number in range(3)
+        )
+        cls.recipe = {
+            'name': 'Recipe', 'text': 'Test recipe', 'cooking_time': 10,
+            'image': image_payload(),
+            'tags': [tag.id for tag in cls.tags],
+            'ingredients': [{'id': ingredient.id, 'amount': 1}
+                            for ingredient in cls.ingredients],
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        response = self.client.post('/api/recipes/', self.recipe,
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+        self.url = f'/api/recipes/{response.data["id"]}/'
+
+    def put_writes(self, recipe):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(self.url, recipe, format='json')
+        self.assertEqual(response.status_code, 200)
+        return Counter(
+            match.groups() for match in (
+                WRITE.match(query['sql'])
+                for query in queries.captured_queries
+            ) if match
+        )
+
+    def test_unchanged(self):
+        # Only the recipe row, tags and ingredients are left alone
+        self.assertEqual(self.put_writes(self.recipe), {
+            ('UPDATE', 'recipes_recipe'): 1,
+        })
+
+    def test_one_ingredient_changed(self):
+        recipe = dict(self.recipe, ingredients=[
+            dict(ingredient, amount=2) if number == 0 else ingredient
+            for number, ingredient in enumerate(self.recipe['ingredients'])
+        ])
+        self.assertEqual(self.put_writes(recipe), {
+            ('UPDATE', 'recipes_recipe'): 1,
+            ('UPDATE', 'recipes_ingredientrecipe'): 1,
+        })
@@ -0,0 +1,35 @@
+from django.test import TestCase
+from rest_framework.exceptions import ValidationError
+
+from api.serializers import RecipeCreateUpdateSerializer
+from recipes.models import Tag
+
+
+class BulkPrimaryKeyRelatedFieldTest(TestCase):
+    """Tags are read with one query and accept what the child field does"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = Tag.objects.bulk_create(
+            Tag(name=f'Tag {number}', color=f'#{number:06x}',
+                slug=f'tag-{number}')
+            for number in range(2)
+        )
+
+    def setUp(self):
+        self.field = RecipeCreateUpdateSerializer().fields['tags']
+
+    def test_pk_forms(self):
+        first, second = self.tags
+        for data in ([first.id, second.id], [str(first.id), second.id],
+                     [f'0{first.id}', float(second.id)]):
+            with self.subTest(data=data), self.assertNumQueries(1):
+                self.assertEqual(self.field.to_internal_value(data),
+                                 [first, second])
+
+    def test_invalid_pks(self):
+        missing = max(tag.id for tag in self.tags) + 1
+        for data in ([True], [self.tags[0].id, missing], ['abc'], [None],
+                     [[self.tags[0].id]]):
+            with self.subTest(data=data), self.assertRaises(ValidationError):
+                self.field.to_internal_value(data)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
@@ -11,3 +12,23 @@ router.register(r'recipes', views.RecipeViewSet, 'recipes')
 urlpatterns = [
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_VIEWS:
+    from api import async_views
+
+    # Matched first, they pass what they do not cover to the viewsets
+    sync_views = {url.name: url.callback for url in router.urls}
+    urlpatterns = [
+        path('tags/', async_views.TagView.as_view(
+            sync_view=sync_views['tags-list'])),
+        path('tags/<int:pk>/', async_views.TagView.as_view(
+            sync_view=sync_views['tags-detail'])),
+        path('ingredients/', async_views.IngredientView.as_view(
+            sync_view=sync_views['ingredients-list'])),
+        path('ingredients/<int:pk>/', async_views.IngredientView.as_view(
+            sync_view=sync_views['ingredients-detail'])),
+        path('recipes/', async_views.RecipeListView.as_view(
+            sync_view=sync_views['recipes-list'])),
+        path('recipes/<int:pk>/', async_views.RecipeDetailView.as_view(
+            sync_view=sync_views['recipes-detail'])),
+    ] + urlpatterns
@@ -1,38 +1,96 @@
-from django.db.models import Sum
-from django.http.response import HttpResponse
+from django.db import transaction
+from django.db.models import F
+from django.http.response import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
-from api import pagintation, serializers
-from api.filters import IngredientNameFilter, RecipeFilter
+from api import exports, pagintation, payloads, renderers, serializers
+from api.commomserializers import ShortRecipeSerializer
+from api.filters import RecipeFilter
+from api.mixins import (AnonymousResponseCacheMixin, PairBatchMixin,
+                        ReferenceDataMixin)
 from api.permissions import IsAuthorOrAdminOrReadOnly
-from recipes import models
+from cookingcrafts.constants import Common as C
+from recipes import autocomplete, models
+from recipes.cache import get_reference_data
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ReferenceDataMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = serializers.TagSerializer
     queryset = models.Tag.objects.all()
 
+    def list(self, request, *args, **kwargs):
+        reference = get_reference_data()
+        return self.reference_response(reference, reference.tags)
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+    def retrieve(self, request, *args, **kwargs):
+        reference = get_reference_data()
+        return self.reference_response(reference, self.get_reference_item(
+            reference.tags_by_id
+        ))
+
+
+class IngredientViewSet(ReferenceDataMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = serializers.IngredientSerializer
     queryset = models.Ingredient.objects.all()
-    filter_backends = (IngredientNameFilter,)
-    search_fields = ('^name',)
 
+    def list(self, request, *args, **kwargs):
+        reference = get_reference_data()
+        name = request.query_params.get('name', '').strip()
+        if not name:
+            return self.reference_response(reference, reference.ingredients)
+        ingredients = autocomplete.search(name, C.AUTOCOMPLETE_LIMIT)
+        return self.reference_response(
+            reference, self.get_serializer(ingredients, many=True).data
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        reference = get_reference_data()
+        return self.reference_response(reference, self.get_reference_item(
+            reference.ingredients_by_id
+        ))
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(AnonymousResponseCacheMixin, PairBatchMixin,
+                    viewsets.ModelViewSet):
     queryset = models.Recipe.objects.all()
     pagination_class = pagintation.CustomPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     permission_classes = (IsAuthorOrAdminOrReadOnly,)
+    lookup_value_regex = r'\d+'
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request,
+                                    *args, **kwargs)
+
+    def uses_payloads(self):
+        """Recipes come from cached payloads, authenticated users get
+        them with their own flags"""
+        return self.action in ('list', 'retrieve')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.uses_payloads():
+            queryset = queryset.only('id')
+        elif self.request.method in SAFE_METHODS:
+            queryset = queryset.with_related().with_user_flags(
+                self.request.user
+            )
+        return queryset
 
     def get_serializer_class(self):
+        if self.uses_payloads():
+            return payloads.RecipePayloadSerializer
         if self.request.method in SAFE_METHODS:
             return serializers.RecipeListRetrieveSerializer
         return serializers.RecipeCreateUpdateSerializer
@@ -48,86 +106,107 @@ class RecipeViewSet(viewsets.ModelViewSet):
         kwargs['partial'] = False
         return self.update(request, *args, **kwargs)
 
+    def add_entry(self, model, message):
+        """
+        Adds the recipe with one INSERT, the unique constraint rejects
+        duplicates. Only a rejected insert looks why it was rejected
+        """
+        user, recipe_id = self.request.user, self.kwargs['pk']
+        with transaction.atomic():
+            entry = model.objects.add(user.id, recipe_id)
+        if entry is None:
+            if not models.Recipe.objects.filter(id=recipe_id).exists():
+                return Response({'detail': 'Not Found'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            return Response({api_settings.NON_FIELD_ERRORS_KEY: [message]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(ShortRecipeSerializer(entry.recipe).data,
+                        status=status.HTTP_201_CREATED)
+
+    def remove_entry(self, model, message, detail):
+        """Removes the recipe with one DELETE ... RETURNING"""
+        user, recipe_id = self.request.user, self.kwargs['pk']
+        with transaction.atomic():
+            entry = model.objects.remove(user.id, recipe_id)
+        if entry is None:
+            get_object_or_404(models.Recipe.objects.only('id'), id=recipe_id)
+            return Response({'detail': message},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({'detail': detail},
+                        status=status.HTTP_204_NO_CONTENT)
+
     @action(['post'], detail=True,
             permission_classes=(IsAuthenticated,),)
     def favorite(self, request, pk):
-        user = request.user
-        if not models.Recipe.objects.filter(id=pk).exists():
-            return Response({'detail': 'Not Found'},
-                            status=status.HTTP_400_BAD_REQUEST)
-        recipe = models.Recipe.objects.get(id=pk)
-        serializer = serializers.FavouriteSerializer(
-            context={'request': request},
-            data={'user': user.id, 'recipe': recipe.id})
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return self.add_entry(models.Favourite,
+                              'The recipe is already in your favourites')
 
     @favorite.mapping.delete
     def favorite_delete(self, request, pk):
-        user = request.user
-        recipe = get_object_or_404(models.Recipe, id=pk)
-        if models.Recipe.objects.filter(id=pk).exists():
-            if not models.Favourite.objects.filter(
-                user=user.id, recipe=recipe.id
-            ).exists():
-                return Response({"detail': The recipe doesn't exists"},
-                                status=status.HTTP_400_BAD_REQUEST)
-        favourite_instance = get_object_or_404(
-            models.Favourite, user=user.id, recipe=recipe.id)
-        favourite_instance.delete()
-        return Response({'detail': 'The recipe was removed from favourites'},
-                        status=status.HTTP_204_NO_CONTENT)
+        return self.remove_entry(models.Favourite,
+                                 "The recipe doesn't exists",
+                                 'The recipe was removed from favourites')
 
     @action(['post'], detail=True,
             url_path=r'shopping_cart',
             permission_classes=(IsAuthenticated,))
     def shopping_cart(self, request, pk):
-        user = request.user
-        if not models.Recipe.objects.filter(id=pk).exists():
-            return Response({'detail': 'Not Found'},
-                            status=status.HTTP_400_BAD_REQUEST)
-        recipe = models.Recipe.objects.get(id=pk)
-        serializer = serializers.ShoppingListSerializer(
-            context={'request': request},
-            data={'user': user.id, 'recipe': recipe.id})
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return self.add_entry(models.ShoppingList,
+                              'The recipe is already in your Shopping list')
 
     @shopping_cart.mapping.delete
     def shopping_cart_delete(self, request, pk):
-        user = request.user
-        recipe = get_object_or_404(models.Recipe, id=pk)
-        if models.Recipe.objects.filter(id=pk).exists():
-            if not models.ShoppingList.objects.filter(
-                user=user.id, recipe=recipe.id
-            ).exists():
-                return Response({"detail': The recipe doesn't exists"},
-                                status=status.HTTP_400_BAD_REQUEST)
-        recipe_in_shopping_list = get_object_or_404(
-            models.ShoppingList, user=user.id, recipe=recipe.id
-        )
-        recipe_in_shopping_list.delete()
-        return Response({'detail': 'The recipe was removed from List'},
-                        status=status.HTTP_204_NO_CONTENT)
+        return self.remove_entry(models.ShoppingList,
+                                 "The recipe doesn't exists",
+                                 'The recipe was removed from List')
+
+    @action(['post'], detail=False,
+            url_path=r'favorite', url_name='favorite-batch',
+            permission_classes=(IsAuthenticated,))
+    def favorite_batch(self, request):
+        """{"ids": [...]} of recipes to add to favourites"""
+        return self.batch_response(models.Favourite, add=True)
+
+    @favorite_batch.mapping.delete
+    def favorite_batch_delete(self, request):
+        return self.batch_response(models.Favourite, add=False)
+
+    @action(['post'], detail=False,
+            url_path=r'shopping_cart', url_name='shopping-cart-batch',
+            permission_classes=(IsAuthenticated,))
+    def shopping_cart_batch(self, request):
+        """{"ids": [...]} of recipes to add to the shopping list"""
+        return self.batch_response(models.ShoppingList, add=True)
+
+    @shopping_cart_batch.mapping.delete
+    def shopping_cart_batch_delete(self, request):
+        return self.batch_response(models.ShoppingList, add=False)
 
     @action(['get'], detail=False,
             url_path=r'download_shopping_cart',
-            permission_classes=(IsAuthenticated,))
+            permission_classes=(IsAuthenticated,),
+            renderer_classes=(renderers.PlainTextRenderer,
+                              renderers.CSVRenderer,
+                              JSONRenderer))
     def download_shopping_cart(self, request):
-        ingredients = models.IngredientRecipe.objects.filter(
-            recipe__users_shoppinglist__user=request.user).values(
-                'ingredient__name', 'ingredient__measurement_unit'
-        ).order_by('ingredient__name').annotate(
-            ingredient_total=Sum('amount'))
-        shopping_list = ['Products to buy to cook selected dishes:\n\n']
-        for item in ingredients:
-            shopping_list.append(f"{item['ingredient__name']} - "
-                                 f"{item['ingredient_total']} "
-                                 f"{item['ingredient__measurement_unit']}\n")
-
-        filename = f'{request.user.username}_shopping_list.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
+        """
+        Streams the shopping list in the format chosen by ?format=
+        (txt, csv or json) or by the Accept header, txt by default
+        """
+        ingredients = models.ShoppingListIngredient.objects.filter(
+            user=request.user).values(
+                'ingredient__name', 'ingredient__measurement_unit',
+                ingredient_total=F('amount')
+        ).order_by('ingredient__name').iterator(
+            chunk_size=C.SHOPPING_LIST_CHUNK_SIZE
+        )
+        export = exports.EXPORTS[request.accepted_renderer.format](
+            ingredients
+        )
+
+        filename = (f'{request.user.username}_shopping_list.'
+                    f'{export.extension}')
+        response = StreamingHttpResponse(export,
+                                         content_type=export.content_type)
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
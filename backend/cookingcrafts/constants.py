@@ -8,6 +8,7 @@ class User(IntEnum):
     MAX_LAST_NAME = 150
     MAX_EMAIL_FIELD = 254
     MAX_ROLE_NAME = 15
+    AUTH_TOKEN_CACHE_TIMEOUT = 300
 
 
 class Recipe(IntEnum):
@@ -19,7 +20,16 @@ class Recipe(IntEnum):
     MIN_INGR_AMOUNT = 1
     MIN_COOKING_TIME = 1
     MAX_COOKING_TIME = 32000
+    MAX_IMAGE_PATH = 255
+    MAX_IMAGE_JOB_STATUS = 10
 
 
 class Common(IntEnum):
     PAGE_SIZE = 3
+    SHOPPING_LIST_CHUNK_SIZE = 500
+    AUTOCOMPLETE_LIMIT = 20
+    REFERENCE_DATA_TIMEOUT = 300
+    CACHED_COUNT_MIN = 1000
+    CACHED_COUNT_TIMEOUT = 60
+    RESPONSE_CACHE_TIMEOUT = 300
+    RESPONSE_CACHE_MAX_AGE = 30
@@ -64,7 +64,15 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        # Seconds a connection is reused by following requests of a worker,
+        # 0 closes it after every request
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        # Reused connections are checked before the first query of a request
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+        # Behind pgbouncer in transaction pooling mode a cursor can't
+        # outlive a transaction, iterator() then fetches in chunks
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS') == 'True',
     },
     'debug_db': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -74,6 +82,24 @@ DATABASES = {
 
 DATABASES['default'] = DATABASES['debug_db'] if DEBUG else DATABASES['production']
 
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+        # Local memory and file caches keep 300 entries by default, one
+        # page of recipes writes as many payloads as it has recipes.
+        # Redis and memcached are bounded by their own memory limits
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 20000)),
+        } if 'locmem' in CACHE_BACKEND or 'filebased' in CACHE_BACKEND else {},
+    }
+}
+# Token authentication is cached only in a cache shared by all workers,
+# with a process-local one a logged out token would keep working
+# on the other workers
+AUTH_TOKEN_CACHE = 'locmem' not in CACHE_BACKEND
+
 AUTH_USER_MODEL = 'users.User'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -97,7 +123,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
 }
 
@@ -129,4 +155,20 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# 'thread' renders recipe images in background threads of web workers,
+# 'queue' leaves them for `python manage.py process_images`
+IMAGE_PIPELINE = os.getenv('IMAGE_PIPELINE', 'thread')
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+# Limits for base64 images in recipes, checked before the image is decoded
+MAX_IMAGE_SIZE = int(os.getenv('MAX_IMAGE_SIZE', 20 * 1024 * 1024))
+MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', 40_000_000))
+# Async views of hot read endpoints, set by asgi.py
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS') == 'True'
+if ASYNC_VIEWS:
+    # The async ORM queries from executor threads, where persistent
+    # connections are never closed at the end of a request
+    DATABASES['production']['CONN_MAX_AGE'] = 0
+# Ids in one request to the favourite, cart and subscribe batch endpoints
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 100))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -0,0 +1,16 @@
+"""
+Gunicorn settings, read from the working directory of the container.
+SERVER_MODE=asgi runs uvicorn workers on cookingcrafts.asgi, where the
+hot read endpoints are served by async views, one worker holds many
+concurrent clients. Sync workers on cookingcrafts.wsgi by default.
+"""
+import os
+
+bind = '0.0.0.0:8888'
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'cookingcrafts.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'cookingcrafts.wsgi:application'
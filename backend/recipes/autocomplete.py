@@ -0,0 +1,87 @@
+from bisect import bisect_left
+from threading import Lock
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+
+from .cache import aget_reference_data, get_reference_data
+from .models import Ingredient
+
+
+class IngredientIndex:
+    """
+    In-process sorted index of ingredient names.
+    Prefix lookups are a binary search, substring lookups scan names.
+    """
+
+    def __init__(self, ingredients):
+        self.entries = sorted(
+            (name.casefold(), id, name, measurement_unit)
+            for id, name, measurement_unit in ingredients
+        )
+        self.keys = [entry[0] for entry in self.entries]
+
+    def search(self, query, limit):
+        query = query.casefold()
+        found = []
+        position = bisect_left(self.keys, query)
+        while (len(found) < limit and position < len(self.keys)
+               and self.keys[position].startswith(query)):
+            found.append(self.entries[position])
+            position += 1
+        if len(found) < limit:
+            for entry in self.entries:
+                if query in entry[0] and not entry[0].startswith(query):
+                    found.append(entry)
+                    if len(found) == limit:
+                        break
+        return [Ingredient(id=id, name=name, measurement_unit=unit)
+                for _, id, name, unit in found]
+
+
+_index = (None, None)
+_index_lock = Lock()
+
+
+def get_index(reference=None):
+    """Index of the current reference data snapshot"""
+    global _index
+    if reference is None:
+        reference = get_reference_data()
+    with _index_lock:
+        version, index = _index
+        if index is None or version != reference.version:
+            index = IngredientIndex(
+                (ingredient['id'], ingredient['name'],
+                 ingredient['measurement_unit'])
+                for ingredient in reference.ingredients
+            )
+            _index = (reference.version, index)
+        return index
+
+
+def search_database(query, limit):
+    """Relies on pattern_ops and trigram indexes from migrations"""
+    found = list(Ingredient.objects.filter(name__istartswith=query)[:limit])
+    if len(found) < limit:
+        found += Ingredient.objects.filter(name__icontains=query).exclude(
+            name__istartswith=query
+        )[:limit - len(found)]
+    return found
+
+
+def search(query, limit):
+    """
+    Ingredients starting with the query go first,
+    then ingredients containing it, both sorted by name
+    """
+    if connection.vendor == 'postgresql':
+        return search_database(query, limit)
+    return get_index().search(query, limit)
+
+
+async def asearch(query, limit):
+    """search for async views"""
+    if connection.vendor == 'postgresql':
+        return await sync_to_async(search_database)(query, limit)
+    return get_index(await aget_reference_data()).search(query, limit)
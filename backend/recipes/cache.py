@@ -0,0 +1,190 @@
+import time
+from threading import Lock
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+from cookingcrafts.constants import Common as C
+
+from .models import Ingredient, Tag
+
+VERSION_KEY = 'reference_data_version'
+DATA_KEY = 'reference_data'
+RECIPES_VERSION_KEY = 'recipes_version'
+RECIPE_VERSION_KEY = 'recipe_version'
+
+
+class ReferenceData:
+    """
+    Snapshot of tags and ingredients. It is never changed after creation,
+    a new snapshot is built when the version changes.
+    """
+
+    def __init__(self, version, tags, ingredients):
+        self.version = version
+        self.created = time.monotonic()
+        self.tags = tuple(tags)
+        self.tags_by_id = {tag['id']: tag for tag in self.tags}
+        self.ingredients = tuple(ingredients)
+        self.ingredients_by_id = {
+            ingredient['id']: ingredient for ingredient in self.ingredients
+        }
+
+    @property
+    def etag(self):
+        return f'"{self.version}"'
+
+    def is_expired(self):
+        return time.monotonic() - self.created > C.REFERENCE_DATA_TIMEOUT
+
+
+_snapshot = None
+_snapshot_lock = Lock()
+
+
+def _load(version):
+    """Takes data from the shared cache, so only one worker hits DB"""
+    data = cache.get(f'{DATA_KEY}:{version}')
+    if data is None:
+        data = (
+            list(Tag.objects.values('id', 'name', 'color', 'slug')),
+            list(Ingredient.objects.values('id', 'name', 'measurement_unit')),
+        )
+        cache.set(f'{DATA_KEY}:{version}', data, C.REFERENCE_DATA_TIMEOUT)
+    return ReferenceData(version, *data)
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def _is_current(snapshot, version):
+    return (snapshot is not None and snapshot.version == version
+            and not snapshot.is_expired())
+
+
+def get_reference_data():
+    global _snapshot
+    version = _get_version(VERSION_KEY)
+    snapshot = _snapshot
+    if _is_current(snapshot, version):
+        return snapshot
+    with _snapshot_lock:
+        if _snapshot is snapshot:
+            _snapshot = _load(version)
+        return _snapshot
+
+
+async def _aload(version):
+    data = await cache.aget(f'{DATA_KEY}:{version}')
+    if data is None:
+        data = (
+            [tag async for tag in Tag.objects.values(
+                'id', 'name', 'color', 'slug'
+            )],
+            [ingredient async for ingredient in Ingredient.objects.values(
+                'id', 'name', 'measurement_unit'
+            )],
+        )
+        await cache.aset(f'{DATA_KEY}:{version}', data,
+                         C.REFERENCE_DATA_TIMEOUT)
+    return ReferenceData(version, *data)
+
+
+async def _aget_version(key):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, uuid4().hex, None)
+        version = await cache.aget(key)
+    return version
+
+
+async def aget_reference_data():
+    """
+    get_reference_data for async views, the snapshot is shared. The lock
+    is not held across awaits, concurrent requests may load it twice
+    """
+    global _snapshot
+    version = await _aget_version(VERSION_KEY)
+    snapshot = _snapshot
+    if _is_current(snapshot, version):
+        return snapshot
+    _snapshot = snapshot = await _aload(version)
+    return snapshot
+
+
+def _publish_version():
+    global _snapshot
+    cache.set(VERSION_KEY, uuid4().hex, None)
+    _snapshot = None
+
+
+def invalidate(**kwargs):
+    """New version is published after commit, a snapshot is never built
+    from changes which are not committed yet or are rolled back"""
+    transaction.on_commit(_publish_version)
+
+
+def get_recipes_version():
+    """Changes whenever a recipe is added or removed or may match other
+    filters, searches or orderings"""
+    return _get_version(RECIPES_VERSION_KEY)
+
+
+async def aget_recipes_version():
+    return await _aget_version(RECIPES_VERSION_KEY)
+
+
+def invalidate_recipes(**kwargs):
+    """New version is published after commit, so no response is cached
+    from the data of a transaction that is still running"""
+    transaction.on_commit(
+        lambda: cache.set(RECIPES_VERSION_KEY, uuid4().hex, None)
+    )
+
+
+def _recipe_version_keys(recipe_ids):
+    return {f'{RECIPE_VERSION_KEY}:{recipe_id}': recipe_id
+            for recipe_id in recipe_ids}
+
+
+def _new_versions(keys, versions):
+    """Versions of recipes which have none yet, or were evicted"""
+    return {key: uuid4().hex for key, recipe_id in keys.items()
+            if recipe_id not in versions}
+
+
+def get_recipe_versions(recipe_ids):
+    """Versions by recipe id, a version changes whenever data shown
+    in the recipe changes"""
+    keys = _recipe_version_keys(recipe_ids)
+    versions = {keys[key]: version
+                for key, version in cache.get_many(keys).items()}
+    new = _new_versions(keys, versions)
+    if new:
+        cache.set_many(new, None)
+        versions.update((keys[key], version) for key, version in new.items())
+    return versions
+
+
+async def aget_recipe_versions(recipe_ids):
+    keys = _recipe_version_keys(recipe_ids)
+    versions = {keys[key]: version
+                for key, version in (await cache.aget_many(keys)).items()}
+    new = _new_versions(keys, versions)
+    if new:
+        await cache.aset_many(new, None)
+        versions.update((keys[key], version) for key, version in new.items())
+    return versions
+
+
+def invalidate_recipe_versions(recipe_ids):
+    """Versions are dropped after commit, the next read makes new ones"""
+    keys = list(_recipe_version_keys(recipe_ids))
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,79 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import Subscribe, User
+
+from .models import Favourite, Recipe, ShoppingList
+
+
+class Counter:
+    """
+    Number of rows of a join table pointing to an object, kept in
+    a column of that object and changed with F-expressions only
+    """
+
+    def __init__(self, source, foreign_key, target, column):
+        self.source = source
+        self.foreign_key = foreign_key
+        self.target = target
+        self.column = column
+
+    def __str__(self):
+        return f'{self.target._meta.label}.{self.column}'
+
+    def _change(self, target_ids, delta):
+        self.target.objects.filter(id__in=target_ids).update(**{
+            self.column: Greatest(F(self.column) + delta, Value(0))
+        })
+
+    def _change_by_rows(self, instances, sign):
+        """One UPDATE for every distinct number of rows per target"""
+        rows = defaultdict(int)
+        for instance in instances:
+            rows[getattr(instance, self.foreign_key)] += 1
+        targets = defaultdict(list)
+        for target_id, count in rows.items():
+            targets[count * sign].append(target_id)
+        for delta, target_ids in targets.items():
+            self._change(target_ids, delta)
+
+    def created(self, sender, instance, created, **kwargs):
+        if created:
+            self._change([getattr(instance, self.foreign_key)], 1)
+
+    def deleted(self, sender, instance, **kwargs):
+        self._change([getattr(instance, self.foreign_key)], -1)
+
+    def added(self, sender, instances, **kwargs):
+        self._change_by_rows(instances, 1)
+
+    def removed(self, sender, instances, **kwargs):
+        self._change_by_rows(instances, -1)
+
+    def live_count(self):
+        return Coalesce(Subquery(
+            self.source.objects.filter(
+                **{self.foreign_key: OuterRef('pk')}
+            ).order_by().values(self.foreign_key).annotate(
+                count=Count('*')
+            ).values('count')
+        ), Value(0))
+
+    def mismatches(self):
+        return self.target.objects.annotate(
+            live=self.live_count()
+        ).exclude(**{self.column: F('live')}).values_list(
+            'id', self.column, 'live'
+        )
+
+    def rebuild(self):
+        return self.target.objects.update(**{self.column: self.live_count()})
+
+
+COUNTERS = (
+    Counter(Favourite, 'recipe_id', Recipe, 'favourites_count'),
+    Counter(ShoppingList, 'recipe_id', Recipe, 'shopping_lists_count'),
+    Counter(Subscribe, 'author_id', User, 'subscribers_count'),
+)
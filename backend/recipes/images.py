@@ -0,0 +1,120 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps, features
+
+from .cache import invalidate_recipe_versions
+from .models import ImageJob, Recipe
+
+logger = logging.getLogger(__name__)
+
+RENDITION_WIDTHS = (320, 640, 1280)
+RENDITIONS_DIR = 'recipes/renditions'
+QUALITY = 80
+
+_executor = None
+
+
+def rendition_formats():
+    if 'avif' in features.get_supported_modules():
+        return ('webp', 'avif')
+    return ('webp',)
+
+
+def schedule(image):
+    """
+    Queues rendition of the uploaded image. Images are content-hashed,
+    so already processed image is only linked to the recipe.
+    Returns renditions known at the moment.
+    """
+    job, _ = ImageJob.objects.get_or_create(image=image)
+    if job.status == ImageJob.DONE:
+        recipe_ids = list(Recipe.objects.filter(image=image).exclude(
+            image_renditions=job.renditions
+        ).values_list('id', flat=True))
+        if recipe_ids:
+            Recipe.objects.filter(id__in=recipe_ids).update(
+                image_renditions=job.renditions
+            )
+            invalidate_recipe_versions(recipe_ids)
+    elif (job.status == ImageJob.PENDING
+          and settings.IMAGE_PIPELINE == 'thread'):
+        transaction.on_commit(lambda: _submit(job.id))
+    return job.renditions
+
+
+def _submit(job_id):
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS,
+                                       thread_name_prefix='images')
+    _executor.submit(_process_in_thread, job_id)
+
+
+def _process_in_thread(job_id):
+    try:
+        job = claim(ImageJob.objects.filter(id=job_id))
+        if job is not None:
+            process(job)
+    finally:
+        connections.close_all()
+
+
+def claim(jobs):
+    """Marks first pending job as processing, safe for many workers"""
+    for job in jobs.filter(status=ImageJob.PENDING).order_by('id')[:10]:
+        if ImageJob.objects.filter(
+            id=job.id, status=ImageJob.PENDING
+        ).update(status=ImageJob.PROCESSING, attempts=job.attempts + 1):
+            return job
+    return None
+
+
+def render(image):
+    """Saves resized copies of the image, returns their names"""
+    storage = Recipe._meta.get_field('image').storage
+    stem = PurePath(image).stem
+    renditions = {}
+    with storage.open(image) as source_file, \
+            Image.open(source_file) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ('RGB', 'RGBA'):
+            source = source.convert('RGBA' if 'A' in source.getbands()
+                                    else 'RGB')
+        widths = ([width for width in RENDITION_WIDTHS
+                   if width < source.width] or [source.width])
+        for width in widths:
+            height = max(1, round(source.height * width / source.width))
+            resized = source.resize((width, height), Image.LANCZOS)
+            for image_format in rendition_formats():
+                name = f'{RENDITIONS_DIR}/{stem}-{width}.{image_format}'
+                if not storage.exists(name):
+                    buffer = BytesIO()
+                    resized.save(buffer, image_format.upper(),
+                                 quality=QUALITY)
+                    storage.save(name, ContentFile(buffer.getvalue()))
+                renditions.setdefault(image_format, {})[str(width)] = name
+    return renditions
+
+
+def process(job):
+    try:
+        renditions = render(job.image)
+    except Exception as error:
+        logger.exception('Image rendition failed: %s', job.image)
+        ImageJob.objects.filter(id=job.id).update(
+            status=ImageJob.FAILED, error=str(error)
+        )
+        return
+    with transaction.atomic():
+        ImageJob.objects.filter(id=job.id).update(
+            status=ImageJob.DONE, renditions=renditions, error=''
+        )
+        recipes = Recipe.objects.filter(image=job.image)
+        invalidate_recipe_versions(list(recipes.values_list('id', flat=True)))
+        recipes.update(image_renditions=renditions)
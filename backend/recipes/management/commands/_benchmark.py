@@ -0,0 +1,123 @@
+"""Helpers shared by benchmark commands, not a command itself"""
+import random
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, setup_test_environment,
+                               teardown_test_environment)
+from rest_framework.authtoken.models import Token
+
+from recipes import search
+from recipes.counters import COUNTERS
+from recipes.models import (Favourite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingList, ShoppingListIngredient, Tag)
+from users.models import Subscribe, User
+
+BENCHMARK_PASSWORD = 'Benchmark-Password-1'
+BENCHMARK_IMAGE = 'recipes/benchmark.png'
+
+
+@contextmanager
+def test_database():
+    """Runs benchmark in a fresh database, never touching real data"""
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0,
+                                                  autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed(users=50, recipes=1000, ingredients=2000, tags=10,
+         ingredients_per_recipe=8, favourites=20, carts=10,
+         subscriptions=10, random_seed=0):
+    """Creates synthetic dataset, returns token of the first user"""
+    generator = random.Random(random_seed)
+    password = make_password(BENCHMARK_PASSWORD)
+    user_ids = [user.id for user in User.objects.bulk_create(
+        User(email=f'user{number}@benchmark.local',
+             username=f'user{number}', first_name='Benchmark',
+             last_name=f'User{number}', password=password)
+        for number in range(users)
+    )]
+    tag_ids = [tag.id for tag in Tag.objects.bulk_create(
+        Tag(name=f'Tag {number}', color=f'#{number:06x}',
+            slug=f'tag-{number}')
+        for number in range(tags)
+    )]
+    ingredient_ids = [ingredient.id for ingredient in
+                      Ingredient.objects.bulk_create(
+                          Ingredient(name=f'ingredient {number}',
+                                     measurement_unit='g')
+                          for number in range(ingredients)
+                      )]
+    recipe_ids = [recipe.id for recipe in Recipe.objects.bulk_create(
+        (Recipe(author_id=generator.choice(user_ids),
+                name=f'Recipe {number}',
+                description=f'Benchmark recipe number {number}',
+                image=BENCHMARK_IMAGE,
+                cooking_time=generator.randint(1, 120))
+         for number in range(recipes)), batch_size=1000
+    )]
+    Recipe.tags.through.objects.bulk_create(
+        (Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+         for recipe_id in recipe_ids
+         for tag_id in generator.sample(tag_ids,
+                                        generator.randint(1, min(3, tags)))),
+        batch_size=1000
+    )
+    IngredientRecipe.objects.bulk_create(
+        (IngredientRecipe(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                          amount=generator.randint(1, 500))
+         for recipe_id in recipe_ids
+         for ingredient_id in generator.sample(ingredient_ids,
+                                               ingredients_per_recipe)),
+        batch_size=1000
+    )
+    for model, per_user in ((Favourite, favourites), (ShoppingList, carts)):
+        model.objects.bulk_create(
+            (model(user_id=user_id, recipe_id=recipe_id)
+             for user_id in user_ids
+             for recipe_id in generator.sample(recipe_ids, per_user)),
+            batch_size=1000
+        )
+    Subscribe.objects.bulk_create(
+        (Subscribe(user_id=user_id, author_id=author_id)
+         for user_id in user_ids
+         for author_id in generator.sample(
+             [author for author in user_ids if author != user_id],
+             min(subscriptions, users - 1))),
+        batch_size=1000
+    )
+    ShoppingListIngredient.objects.bulk_create(
+        (ShoppingListIngredient(**row)
+         for row in ShoppingListIngredient.objects.live_totals()),
+        batch_size=1000
+    )
+    for recipe_id in recipe_ids:
+        search.index_recipe(recipe_id)
+    for counter in COUNTERS:
+        counter.rebuild()
+    return Token.objects.create(user_id=user_ids[0]).key
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[round(percent / 100 * (len(ordered) - 1))]
+
+
+def measure(client, method, path, **kwargs):
+    """Returns response, time in milliseconds and number of queries"""
+    # A full query log would make the captured slice empty
+    connection.queries_log.clear()
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = getattr(client, method)(path, **kwargs)
+        content = (b''.join(response.streaming_content)
+                   if response.streaming else response.content)
+        elapsed = (time.perf_counter() - started) * 1000
+    return response, content, elapsed, len(queries.captured_queries)
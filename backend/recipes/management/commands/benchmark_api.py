@@ -0,0 +1,331 @@
+import json
+import platform
+import subprocess
+import tempfile
+from statistics import median
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import urls as api_urls
+from recipes.models import Favourite, Ingredient, Recipe, ShoppingList, Tag
+from users import urls as users_urls
+from users.models import Subscribe, User
+
+from ._benchmark import (BENCHMARK_PASSWORD, measure, percentile, seed,
+                         test_database)
+
+LOCAL_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+}
+# 1x1 transparent PNG
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAf'
+         'FcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==')
+NEW_PASSWORD = 'Benchmark-Password-2'
+
+
+def route_patterns():
+    """URL pattern strings of api and users apps grouped by route name"""
+    routes = {}
+
+    def walk(patterns, prefix=''):
+        for pattern in patterns:
+            if hasattr(pattern, 'url_patterns'):
+                walk(pattern.url_patterns, prefix + str(pattern.pattern))
+            elif pattern.name:
+                routes.setdefault(pattern.name, set()).add(
+                    prefix + str(pattern.pattern)
+                )
+
+    walk(api_urls.urlpatterns)
+    walk(users_urls.urlpatterns)
+    return routes
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Seeds a synthetic dataset in a test database and measures '
+            'latency, SQL queries and response size of every API endpoint')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favourites', type=int, default=20,
+                            help='Favourite recipes per user')
+        parser.add_argument('--carts', type=int, default=10,
+                            help='Recipes in shopping list per user')
+        parser.add_argument('--subscriptions', type=int, default=10,
+                            help='Followed authors per user')
+        parser.add_argument('--requests', type=int, default=20,
+                            help='Requests per endpoint')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write JSON report to file')
+        parser.add_argument('--compare',
+                            help='JSON report of previous run to compare')
+
+    @staticmethod
+    def _client(token=None):
+        client = APIClient()
+        if token:
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        return client
+
+    def _scenarios(self, token, repeat):
+        user = Token.objects.get(key=token).user
+        anonymous, client = self._client(), self._client(token)
+        recipe = Recipe.objects.values_list('id', flat=True).first()
+        middle_page = max(1, Recipe.objects.count() // 12)
+        tag = Tag.objects.values_list('id', flat=True).first()
+        tag_slugs = list(Tag.objects.values_list('slug', flat=True)[:3])
+        ingredient = Ingredient.objects.values_list('id', flat=True).first()
+        other_users = User.objects.exclude(id=user.id).order_by('id')
+        password_user = other_users.first()
+        password_client = self._client(
+            Token.objects.create(user=password_user).key
+        )
+        recipe_data = {
+            'ingredients': [{'id': ingredient, 'amount': 10}],
+            'tags': [tag], 'image': IMAGE, 'name': 'Benchmark created',
+            'text': 'Created by benchmark', 'cooking_time': 10,
+        }
+
+        def same(path, requester=anonymous, **kwargs):
+            return lambda: [(requester, path, kwargs)] * repeat
+
+        def created_recipes():
+            return Recipe.objects.filter(
+                author=user, name='Benchmark created'
+            ).values_list('id', flat=True)[:repeat]
+
+        def logout_clients():
+            return [
+                (self._client(Token.objects.get_or_create(user=other)[0].key),
+                 '/api/auth/token/logout/', {})
+                for other in other_users[1:repeat + 1]
+            ]
+
+        return [
+            ('api-root', 'get', same('/api/')),
+            ('tags-list', 'get', same('/api/tags/')),
+            ('tags-detail', 'get', same(f'/api/tags/{tag}/')),
+            ('ingredients-list', 'get', same('/api/ingredients/')),
+            ('ingredients-list name', 'get',
+             same('/api/ingredients/?name=ingredient 1')),
+            ('ingredients-detail', 'get',
+             same(f'/api/ingredients/{ingredient}/')),
+            ('recipes-list anonymous', 'get', same('/api/recipes/?limit=6')),
+            ('recipes-list', 'get', same('/api/recipes/?limit=6', client)),
+            ('recipes-list limit=100', 'get',
+             same('/api/recipes/?limit=100', client)),
+            ('recipes-list deep page', 'get',
+             same(f'/api/recipes/?limit=6&page={middle_page}', client)),
+            ('recipes-list cursor', 'get',
+             same('/api/recipes/?limit=6&pagination=cursor', client)),
+            ('recipes-list tags', 'get', same(
+                '/api/recipes/?limit=6&'
+                + '&'.join(f'tags={slug}' for slug in tag_slugs), client)),
+            ('recipes-list author', 'get',
+             same(f'/api/recipes/?limit=6&author={user.id}', client)),
+            ('recipes-list is_favorited', 'get',
+             same('/api/recipes/?limit=6&is_favorited=1', client)),
+            ('recipes-list is_in_shopping_cart', 'get',
+             same('/api/recipes/?limit=6&is_in_shopping_cart=1', client)),
+            ('recipes-list search', 'get',
+             same('/api/recipes/?limit=6&search=recipe 1', client)),
+            ('recipes-list ingredients', 'get', same(
+                f'/api/recipes/?limit=6&ingredients={ingredient}', client)),
+            ('recipes-detail anonymous', 'get',
+             same(f'/api/recipes/{recipe}/')),
+            ('recipes-detail', 'get', same(f'/api/recipes/{recipe}/', client)),
+            ('recipes-download-shopping-cart', 'get',
+             same('/api/recipes/download_shopping_cart/', client)),
+            ('recipes-download-shopping-cart csv', 'get',
+             same('/api/recipes/download_shopping_cart/?format=csv', client)),
+            ('recipes-download-shopping-cart json', 'get', same(
+                '/api/recipes/download_shopping_cart/?format=json', client)),
+            ('users-list', 'get', same('/api/users/?limit=6')),
+            ('users-detail', 'get', same(f'/api/users/{user.id}/', client)),
+            ('users-me', 'get', same('/api/users/me/', client)),
+            ('users-subscriptions', 'get', same(
+                '/api/users/subscriptions/?limit=6&recipes_limit=3', client)),
+            ('recipes-list create', 'post', same(
+                '/api/recipes/', client, data=recipe_data, format='json')),
+            ('recipes-detail update', 'patch', lambda: [
+                (client, f'/api/recipes/{recipe_id}/',
+                 {'data': recipe_data, 'format': 'json'})
+                for recipe_id in created_recipes()
+            ]),
+            ('recipes-favorite', 'post', lambda: [
+                (client, f'/api/recipes/{recipe_id}/favorite/', {})
+                for recipe_id in Recipe.objects.exclude(
+                    users_favourite__user=user
+                ).values_list('id', flat=True)[:repeat]
+            ]),
+            ('recipes-favorite delete', 'delete', lambda: [
+                (client, f'/api/recipes/{recipe_id}/favorite/', {})
+                for recipe_id in Favourite.objects.filter(
+                    user=user
+                ).values_list('recipe_id', flat=True)[:repeat]
+            ]),
+            ('recipes-shopping-cart', 'post', lambda: [
+                (client, f'/api/recipes/{recipe_id}/shopping_cart/', {})
+                for recipe_id in Recipe.objects.exclude(
+                    users_shoppinglist__user=user
+                ).values_list('id', flat=True)[:repeat]
+            ]),
+            ('recipes-shopping-cart delete', 'delete', lambda: [
+                (client, f'/api/recipes/{recipe_id}/shopping_cart/', {})
+                for recipe_id in ShoppingList.objects.filter(
+                    user=user
+                ).values_list('recipe_id', flat=True)[:repeat]
+            ]),
+            ('users-subscribe', 'post', lambda: [
+                (client, f'/api/users/{author_id}/subscribe/', {})
+                for author_id in other_users.exclude(
+                    subscribing__user=user
+                ).values_list('id', flat=True)[:repeat]
+            ]),
+            ('users-subscribe delete', 'delete', lambda: [
+                (client, f'/api/users/{author_id}/subscribe/', {})
+                for author_id in Subscribe.objects.filter(
+                    user=user
+                ).values_list('author_id', flat=True)[:repeat]
+            ]),
+            ('recipes-detail delete', 'delete', lambda: [
+                (client, f'/api/recipes/{recipe_id}/', {})
+                for recipe_id in created_recipes()
+            ]),
+            ('users-list create', 'post', lambda: [
+                (anonymous, '/api/users/', {'data': {
+                    'email': f'new{number}@benchmark.local',
+                    'username': f'new{number}', 'first_name': 'New',
+                    'last_name': 'User', 'password': BENCHMARK_PASSWORD,
+                }}) for number in range(repeat)
+            ]),
+            ('users-set-password', 'post', lambda: [
+                (password_client, '/api/users/set_password/', {'data': {
+                    'current_password': passwords[0],
+                    'new_password': passwords[1],
+                }}) for number in range(repeat)
+                for passwords in [
+                    (BENCHMARK_PASSWORD, NEW_PASSWORD)[::(-1) ** number]
+                ]
+            ]),
+            ('login', 'post', same('/api/auth/token/login/', data={
+                'email': user.email, 'password': BENCHMARK_PASSWORD,
+            })),
+            ('logout', 'post', logout_clients),
+        ]
+
+    def _run(self, token, repeat):
+        results = []
+        for name, method, requests in self._scenarios(token, repeat):
+            timings, queries, sizes, statuses = [], [], [], set()
+            for requester, path, kwargs in requests():
+                response, content, elapsed, query_count = measure(
+                    requester, method, path, **kwargs
+                )
+                timings.append(elapsed)
+                queries.append(query_count)
+                sizes.append(len(content))
+                statuses.add(response.status_code)
+            if not timings:
+                continue
+            results.append({
+                'name': name,
+                'route': name.split()[0],
+                'method': method.upper(),
+                'path': path,
+                'status': sorted(statuses),
+                'requests': len(timings),
+                'p50_ms': round(percentile(timings, 50), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+                'queries': median(queries),
+                'bytes': median(sizes),
+            })
+            self.stderr.write(
+                f"{name:40} {results[-1]['p50_ms']:9.2f}ms "
+                f"{results[-1]['p95_ms']:9.2f}ms "
+                f"{results[-1]['queries']:6} queries "
+                f"{results[-1]['bytes']:9} bytes {sorted(statuses)}"
+            )
+        return results
+
+    @staticmethod
+    def _not_covered(results):
+        routes = route_patterns()
+        covered = set().union(*(routes.get(result['route'], set())
+                                for result in results))
+        return sorted(name for name, patterns in routes.items()
+                      if not patterns <= covered)
+
+    @staticmethod
+    def _compare(report, baseline):
+        previous = {result['name']: result for result in baseline['results']}
+        for result in report['results']:
+            before = previous.get(result['name'])
+            if before is None:
+                continue
+            changes = []
+            if result['queries'] != before['queries']:
+                changes.append(
+                    f"queries {before['queries']} -> {result['queries']}"
+                )
+            if before['p95_ms'] and result['p95_ms'] > before['p95_ms'] * 1.2:
+                changes.append(
+                    f"p95 {before['p95_ms']}ms -> {result['p95_ms']}ms"
+                )
+            if changes:
+                print(f"{result['name']}: {', '.join(changes)}")
+
+    def handle(self, *args, **options):
+        dataset = {key: options[key] for key in (
+            'users', 'recipes', 'ingredients', 'ingredients_per_recipe',
+            'favourites', 'carts', 'subscriptions', 'requests', 'seed'
+        )}
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            CACHES=LOCAL_CACHE, MEDIA_ROOT=media_root
+        ), test_database():
+            token = seed(
+                users=options['users'], recipes=options['recipes'],
+                ingredients=options['ingredients'],
+                ingredients_per_recipe=options['ingredients_per_recipe'],
+                favourites=options['favourites'], carts=options['carts'],
+                subscriptions=options['subscriptions'],
+                random_seed=options['seed'],
+            )
+            results = self._run(token, options['requests'])
+            database = connection.vendor
+        report = {
+            'commit': git_commit(),
+            'database': database,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'dataset': dataset,
+            'results': results,
+            'not_covered': self._not_covered(results),
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as out_file:
+                out_file.write(output)
+        else:
+            print(output)
+        if options['compare']:
+            with open(options['compare']) as inp_file:
+                self._compare(report, json.load(inp_file))
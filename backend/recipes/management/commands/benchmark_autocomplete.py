@@ -0,0 +1,79 @@
+import random
+import time
+from pathlib import Path
+from statistics import quantiles
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from cookingcrafts.constants import Common as C
+from recipes import autocomplete
+from recipes.models import Ingredient
+
+from .initial_ingredients import iter_json
+
+
+class Command(BaseCommand):
+    help = ('Measures ingredient autocomplete latency over the ingredients '
+            'fixture scaled up by --scale')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=100)
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--database', action='store_true',
+                            help='Also measure database search, the rows '
+                                 'are inserted in a rolled back transaction')
+
+    @staticmethod
+    def _dataset(scale):
+        path = Path(settings.BASE_DIR, 'fixtures', 'ingredients.json')
+        with open(path, encoding='utf-8') as inp_file:
+            fixture = list(iter_json(inp_file))
+        return [
+            (len(fixture) * copy + number,
+             f'{name} {copy}' if copy else name,
+             unit)
+            for copy in range(scale)
+            for number, (name, unit) in enumerate(fixture, start=1)
+        ]
+
+    @staticmethod
+    def _queries(dataset, count, seed):
+        generator = random.Random(seed)
+        names = [name for _, name, _ in generator.sample(dataset, count)]
+        return [name[generator.randrange(len(name)):][:generator.randint(1, 6)]
+                for name in names]
+
+    @staticmethod
+    def _measure(title, search, queries):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            search(query, C.AUTOCOMPLETE_LIMIT)
+            timings.append((time.perf_counter() - started) * 1000)
+        p50, p95 = (quantiles(timings, n=100)[index] for index in (49, 94))
+        print(f'{title}: p50 {p50:.2f}ms, p95 {p95:.2f}ms, '
+              f'max {max(timings):.2f}ms')
+
+    def handle(self, *args, **options):
+        dataset = self._dataset(options['scale'])
+        queries = self._queries(dataset, options['queries'], options['seed'])
+        print(f'Ingredients: {len(dataset)}, queries: {len(queries)}')
+
+        started = time.perf_counter()
+        index = autocomplete.IngredientIndex(dataset)
+        print(f'Index built in {time.perf_counter() - started:.2f}s')
+        self._measure('In-process index', index.search, queries)
+
+        if options['database']:
+            with transaction.atomic():
+                Ingredient.objects.bulk_create(
+                    (Ingredient(name=name, measurement_unit=unit)
+                     for _, name, unit in dataset),
+                    batch_size=5000, ignore_conflicts=True,
+                )
+                self._measure('Database', autocomplete.search_database,
+                              queries)
+                transaction.set_rollback(True)
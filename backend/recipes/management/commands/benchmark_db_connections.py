@@ -0,0 +1,89 @@
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from ._benchmark import percentile, seed, test_database
+
+# Every request queries the database
+DUMMY_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+MODES = (
+    ('new connection per request',
+     {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}),
+    ('persistent',
+     {'CONN_MAX_AGE': None, 'CONN_HEALTH_CHECKS': False}),
+    ('persistent, health checks',
+     {'CONN_MAX_AGE': None, 'CONN_HEALTH_CHECKS': True}),
+)
+
+
+class Command(BaseCommand):
+    help = ('Measures request latency on PostgreSQL with a new connection '
+            'per request and with persistent connections with and without '
+            'health checks. Run with production database settings against '
+            'a local server, or against pgbouncer to measure its pool')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--path', default='/api/recipes/?limit=6')
+        parser.add_argument('--seed', type=int, default=0)
+
+    @staticmethod
+    def _request(client, path):
+        """What the WSGI handler does around a view"""
+        started = time.perf_counter()
+        close_old_connections()
+        response = client.get(path)
+        close_old_connections()
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != 200:
+            raise CommandError(f'{path} answered {response.status_code}')
+        return elapsed
+
+    def _run(self, client, path, repeat):
+        opened = []
+
+        def count(sender, **kwargs):
+            opened.append(sender)
+
+        original = dict(connection.settings_dict)
+        print(f'{"mode":30} {"p50":>10} {"p95":>10} {"connects":>8}')
+        connection_created.connect(count)
+        try:
+            for name, mode in MODES:
+                connection.close()
+                connection.settings_dict.update(mode)
+                # Warm up, the first request always connects
+                self._request(client, path)
+                opened.clear()
+                timings = [self._request(client, path)
+                           for _ in range(repeat)]
+                print(f'{name:30} {percentile(timings, 50):>8.2f}ms '
+                      f'{percentile(timings, 95):>8.2f}ms '
+                      f'{len(opened):>8}')
+                connection.close()
+                connection.settings_dict.clear()
+                connection.settings_dict.update(original)
+        finally:
+            connection_created.disconnect(count)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Connections are measured on PostgreSQL, '
+                               'run without DEBUG and with DB_* settings '
+                               'of a local server')
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            CACHES=DUMMY_CACHE, MEDIA_ROOT=media_root
+        ), test_database():
+            token = seed(recipes=options['recipes'],
+                         random_seed=options['seed'])
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+            self._run(client, options['path'], options['requests'])
@@ -0,0 +1,89 @@
+import base64
+import math
+import multiprocessing
+import os
+import resource
+import tracemalloc
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from PIL import Image
+from rest_framework import serializers
+
+from api.serializers import Base64ImageField
+
+
+class LegacyBase64ImageField(serializers.ImageField):
+    """Previous implementation: whole payload decoded in memory"""
+
+    def to_internal_value(self, data):
+        format, imgstr = data.split(';base64,')
+        data = ContentFile(base64.b64decode(imgstr),
+                           name='temp.' + format.split('/')[-1])
+        return super().to_internal_value(data)
+
+
+# Whole validation of the field, as the recipe serializer runs it
+DECODERS = {'legacy': LegacyBase64ImageField,
+            'streaming': Base64ImageField}
+
+
+def rss_kb():
+    with open('/proc/self/statm') as statm:
+        pages = int(statm.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def measure(decoder, data, results):
+    """Runs in a forked process, so peak RSS belongs to one upload"""
+    baseline = rss_kb()
+    tracemalloc.start()
+    upload = DECODERS[decoder]().to_internal_value(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    upload.close()
+    results.put((
+        peak // 1024,
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline,
+    ))
+
+
+class Command(BaseCommand):
+    help = ('Measures peak memory of decoding and validating one base64 '
+            'recipe image, previous in-memory decode against streaming '
+            'one')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+',
+                            default=(1, 5, 20), help='Image sizes in MB')
+
+    @staticmethod
+    def _payload(size_mb):
+        """PNG of random pixels, so it does not compress below the size"""
+        side = math.isqrt(size_mb * 1024 * 1024 // 3)
+        image = Image.frombytes('RGB', (side, side), os.urandom(side ** 2 * 3))
+        buffer = BytesIO()
+        image.save(buffer, 'PNG', compress_level=0)
+        return ('data:image/png;base64,'
+                + base64.b64encode(buffer.getvalue()).decode())
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        print(f'{"size":>6} {"decoder":>10} {"python peak":>12} '
+              f'{"RSS growth":>11}')
+        for size_mb in options['sizes']:
+            data = self._payload(size_mb)
+            for decoder in DECODERS:
+                results = context.Queue()
+                with override_settings(MAX_IMAGE_SIZE=len(data),
+                                       MAX_IMAGE_PIXELS=size_mb * 10 ** 6):
+                    process = context.Process(target=measure,
+                                              args=(decoder, data, results))
+                    process.start()
+                    python_peak, rss_growth = results.get()
+                    process.join()
+                print(f'{size_mb:>4}MB {decoder:>10} '
+                      f'{python_peak / 1024:>10.1f}MB '
+                      f'{rss_growth / 1024:>9.1f}MB')
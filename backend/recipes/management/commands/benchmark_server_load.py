@@ -0,0 +1,179 @@
+import asyncio
+import os
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ._benchmark import percentile
+
+DEFAULT_PATHS = ('/api/recipes/?limit=6', '/api/recipes/1/', '/api/tags/',
+                 '/api/ingredients/?name=a', '/api/users/subscriptions/')
+
+
+def process_tree_rss(pid):
+    """Resident memory of a process and its children, as gunicorn master
+    and workers, in bytes. Linux only"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                # Name in parentheses may contain spaces
+                parent = int(stat.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, ()))
+        try:
+            with open(f'/proc/{current}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return total
+
+
+class Client:
+    """Keep-alive HTTP/1.1 connection, enough for JSON responses"""
+
+    def __init__(self, host, port, headers):
+        self.host, self.port = host, port
+        self.headers = headers
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def _body(self, headers):
+        if headers.get('transfer-encoding') == 'chunked':
+            body = b''
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0],
+                           16)
+                if not size:
+                    await self.reader.readline()
+                    return body
+                body += await self.reader.readexactly(size)
+                await self.reader.readline()
+        if 'content-length' in headers:
+            return await self.reader.readexactly(
+                int(headers['content-length'])
+            )
+        return await self.reader.read()
+
+    async def get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+        self.writer.write(
+            f'GET {path} HTTP/1.1\r\nHost: {self.host}\r\n'
+            f'{self.headers}\r\n'.encode('latin-1')
+        )
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, value = line.decode('latin-1').split(':', 1)
+            headers[name.strip().lower()] = value.strip().lower()
+        await self._body(headers)
+        if headers.get('connection') == 'close':
+            await self.close()
+        return status
+
+
+class Command(BaseCommand):
+    help = ('Loads a running server with concurrent keep-alive clients '
+            'and reports throughput, latency and memory of the server '
+            'processes. Run it against gunicorn with sync workers and '
+            'with SERVER_MODE=asgi, with worker counts giving equal memory')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8888')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Requested in turn, by default the hot '
+                                 'read endpoints')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--duration', type=float, default=30)
+        parser.add_argument('--token', help='Authenticates requests, '
+                            'subscriptions need it')
+        parser.add_argument('--pid', type=int,
+                            help='Gunicorn master, memory is measured for '
+                                 'it and its workers')
+
+    async def _worker(self, client, paths, deadline, timings, errors):
+        index = 0
+        while time.perf_counter() < deadline:
+            path = paths[index % len(paths)]
+            index += 1
+            started = time.perf_counter()
+            try:
+                status = await client.get(path)
+            except (OSError, ValueError, IndexError,
+                    asyncio.IncompleteReadError):
+                errors.append(path)
+                await client.close()
+                continue
+            if status != 200:
+                errors.append(path)
+            timings.append((time.perf_counter() - started) * 1000)
+        await client.close()
+
+    async def _load(self, options, headers, pid, rss):
+        url = urlsplit(options['url'])
+        paths = options['paths'] or DEFAULT_PATHS
+        timings, errors = [], []
+        deadline = time.perf_counter() + options['duration']
+        workers = [
+            self._worker(Client(url.hostname, url.port or 80, headers),
+                         paths, deadline, timings, errors)
+            for _ in range(options['concurrency'])
+        ]
+        if pid:
+            async def sample():
+                while time.perf_counter() < deadline:
+                    rss.append(process_tree_rss(pid))
+                    await asyncio.sleep(1)
+            workers.append(sample())
+        started = time.perf_counter()
+        await asyncio.gather(*workers)
+        return timings, errors, time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        if urlsplit(options['url']).scheme != 'http':
+            raise CommandError('Only plain http servers are loaded')
+        headers = 'Accept: application/json\r\n'
+        if options['token']:
+            headers += f'Authorization: Token {options["token"]}\r\n'
+        pid, rss = options['pid'], []
+        if pid and not os.path.exists(f'/proc/{pid}'):
+            raise CommandError(f'No process {pid}')
+        timings, errors, elapsed = asyncio.run(
+            self._load(options, headers, pid, rss)
+        )
+        if not timings:
+            raise CommandError('No request was answered')
+        throughput = len(timings) / elapsed
+        print(f'requests {len(timings)}, errors {len(errors)}, '
+              f'{throughput:.1f} req/s')
+        print(f'p50 {percentile(timings, 50):.2f}ms, '
+              f'p95 {percentile(timings, 95):.2f}ms')
+        if rss:
+            memory = max(rss) / 2 ** 20
+            print(f'peak RSS {memory:.1f} MB, '
+                  f'{throughput * 100 / memory:.1f} req/s per 100 MB')
@@ -0,0 +1,79 @@
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.filters import RecipeFilter
+from recipes.models import Recipe, Tag
+
+from ._benchmark import measure, percentile, seed, test_database
+
+DUMMY_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return percentile(timings, 50)
+
+
+def first_page(queryset):
+    """What paginator runs: count and ids of the first page"""
+    return lambda: (queryset.count(),
+                    list(queryset.values_list('id', flat=True)[:6]))
+
+
+class Command(BaseCommand):
+    help = ('Measures recipe list latency with a growing number of '
+            'selected tags, responses are not cached. Filter SQL is timed '
+            'for EXISTS and for the previous join with DISTINCT')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            CACHES=DUMMY_CACHE, MEDIA_ROOT=media_root
+        ), test_database():
+            token = seed(recipes=options['recipes'], tags=options['tags'],
+                         random_seed=options['seed'])
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+            request = APIRequestFactory().get('/api/recipes/')
+            slugs = list(Tag.objects.order_by('id').values_list('slug',
+                                                                flat=True))
+            repeat = options['requests']
+            print(f'{"tags":>4} {"count":>7} {"api p50":>10} '
+                  f'{"api p95":>10} {"queries":>7} {"exists":>9} '
+                  f'{"join":>9}')
+            for selected in range(1, len(slugs) + 1):
+                path = '/api/recipes/?limit=6&' + '&'.join(
+                    f'tags={slug}' for slug in slugs[:selected]
+                )
+                timings = []
+                for _ in range(repeat):
+                    response, _, elapsed, queries = measure(client, 'get',
+                                                            path)
+                    timings.append(elapsed)
+                exists = RecipeFilter(
+                    {'tags': slugs[:selected]}, Recipe.objects.all(),
+                    request=request
+                ).qs
+                join = Recipe.objects.filter(
+                    tags__slug__in=slugs[:selected]
+                ).distinct()
+                print(f'{selected:>4} {response.data["count"]:>7} '
+                      f'{percentile(timings, 50):>8.2f}ms '
+                      f'{percentile(timings, 95):>8.2f}ms {queries:>7} '
+                      f'{timed(first_page(exists), repeat):>7.2f}ms '
+                      f'{timed(first_page(join), repeat):>7.2f}ms')
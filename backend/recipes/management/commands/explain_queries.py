@@ -0,0 +1,126 @@
+import json
+import re
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from ._benchmark import seed, test_database
+from .benchmark_api import Command as BenchmarkCommand
+
+# Every query hits the database, nothing is answered from cache
+DUMMY_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE')
+# Full scans of a table, not of an index, virtual table or subquery result
+SQLITE_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+
+def sqlite_scans(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        details = [row[-1] for row in cursor.fetchall()]
+    return [match.group(1) for match in map(SQLITE_SCAN.match, details)
+            if match]
+
+
+def postgresql_scans(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans, nodes = [], [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan':
+            scans.append(node['Relation Name'])
+        nodes.extend(node.get('Plans', ()))
+    return scans
+
+
+class Command(BaseCommand):
+    help = ('Seeds a large synthetic dataset in a test database, runs '
+            'EXPLAIN over SQL of every API endpoint and reports '
+            'sequential scans of large tables. SQLite also reports walking '
+            'a table in primary key order, used by ORDER BY id LIMIT')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--min-rows', type=int, default=1000,
+                            help='Smaller tables are allowed to be scanned')
+        parser.add_argument('--verbose-sql', action='store_true',
+                            help='Print SQL of queries with scans')
+        parser.add_argument('--strict', action='store_true',
+                            help='Exit with 1 if a scan was found')
+
+    def _explain(self, sql):
+        if connection.vendor == 'postgresql':
+            return postgresql_scans(sql)
+        if connection.vendor == 'sqlite':
+            return sqlite_scans(sql)
+        return []
+
+    @staticmethod
+    def _large_tables(min_rows):
+        large = set()
+        with connection.cursor() as cursor:
+            for table in connection.introspection.table_names(cursor):
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM '
+                    f'{connection.ops.quote_name(table)}'
+                )
+                if cursor.fetchone()[0] >= min_rows:
+                    large.add(table)
+        return large
+
+    def _run(self, token, min_rows, verbose_sql):
+        benchmark = BenchmarkCommand()
+        large = self._large_tables(min_rows)
+        found = 0
+        for name, method, requests in benchmark._scenarios(token, 1):
+            requests = requests()
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as queries:
+                for requester, path, kwargs in requests:
+                    response = getattr(requester, method)(path, **kwargs)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+            statements = {query['sql'] for query in queries.captured_queries
+                          if query['sql'].lstrip().startswith(EXPLAINED)}
+            flagged = {}
+            for sql in statements:
+                scans = [table for table in self._explain(sql)
+                         if table in large]
+                if scans:
+                    flagged[sql] = scans
+            print(f'{name:40} {len(statements):3} statements, '
+                  f'{len(flagged)} with scans')
+            for sql, scans in flagged.items():
+                print(f"    scan: {', '.join(scans)}")
+                if verbose_sql:
+                    print(f'    {sql}')
+            found += len(flagged)
+        return found
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            CACHES=DUMMY_CACHE, MEDIA_ROOT=media_root,
+            IMAGE_PIPELINE='queue'
+        ), test_database():
+            token = seed(users=options['users'], recipes=options['recipes'],
+                         ingredients=options['ingredients'],
+                         random_seed=options['seed'])
+            with connection.cursor() as cursor:
+                # Planner statistics of the seeded data
+                cursor.execute('ANALYZE')
+            found = self._run(token, options['min_rows'],
+                              options['verbose_sql'])
+        print(f'Statements with sequential scans: {found}')
+        if found and options['strict']:
+            raise SystemExit(1)
@@ -1,25 +1,99 @@
+import csv
 import json
+import re
+import time
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 
+from cookingcrafts.constants import Recipe as R
+from recipes.cache import invalidate
 from recipes.models import Ingredient
 
+WHITESPACE = re.compile(r'[\s,]*')
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def iter_json(file):
+    """Yields items of a JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('JSON file should contain an array')
+    pos = 1
+    while True:
+        pos = WHITESPACE.match(buffer, pos).end()
+        if buffer.startswith(']', pos):
+            return
+        try:
+            item, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Unexpected end of JSON file')
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        yield item['name'], item['measurement_unit']
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if row and row != ['name', 'measurement_unit']:
+            yield row[0], row[1]
+
+
+READERS = {'.json': iter_json, '.csv': iter_csv}
+
 
 class Command(BaseCommand):
-    def _create_data(self):
-        with open("fixtures/ingredients.json") as inp_file:
-            data_array = json.load(inp_file)
-            counter = 0
-            for line in data_array:
-                name = line['name']
-                unit = line['measurement_unit']
-                if Ingredient.objects.filter(
-                    name=name, measurement_unit=unit
-                ).exists():
+    help = 'Imports ingredients from JSON or CSV file, skipping existing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=Path(settings.BASE_DIR, 'fixtures', 'ingredients.json'),
+            help='JSON or CSV file, fixtures/ingredients.json by default')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only read and validate the file')
+
+    @staticmethod
+    def _read(path):
+        reader = READERS.get(Path(path).suffix.lower())
+        if reader is None:
+            raise CommandError('Only .json and .csv files are supported')
+        with open(path, encoding='utf-8', newline='') as inp_file:
+            for name, unit in reader(inp_file):
+                name, unit = name.strip(), unit.strip()
+                if (not name or not unit
+                        or len(name) > R.MAX_INGREDIENT_NAME
+                        or len(unit) > R.MAX_INGREDIENT_M_UNIT):
+                    print('Skipped invalid ingredient: ', name, unit)
                     continue
-                Ingredient.objects.create(name=name, measurement_unit=unit)
-                counter += 1
-        print('Added new ingredients to database: ', counter)
+                yield Ingredient(name=name, measurement_unit=unit)
+
+    def _create_data(self, path, batch_size, dry_run):
+        started = time.monotonic()
+        existing = Ingredient.objects.count()
+        ingredients = self._read(path)
+        counter = 0
+        while batch := list(islice(ingredients, batch_size)):
+            counter += len(batch)
+            if not dry_run:
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        elapsed = time.monotonic() - started
+        print(f'Read {counter} ingredients in {elapsed:.2f}s '
+              f'({counter / elapsed if elapsed else counter:.0f} rows/sec)')
+        if not dry_run:
+            invalidate()
+            print('Added new ingredients to database: ',
+                  Ingredient.objects.count() - existing)
 
     def handle(self, *args, **options):
-        self._create_data()
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size should be positive')
+        self._create_data(options['path'], options['batch_size'],
+                          options['dry_run'])
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes import images
+from recipes.models import ImageJob
+
+
+class Command(BaseCommand):
+    help = ('Renders resized copies of uploaded recipe images, '
+            'used with IMAGE_PIPELINE=queue')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when the queue is empty')
+        parser.add_argument('--sleep', type=float, default=2.0,
+                            help='Seconds to wait for new jobs')
+        parser.add_argument('--retry', action='store_true',
+                            help='Queue failed and interrupted jobs again')
+
+    def handle(self, *args, **options):
+        if options['retry']:
+            retried = ImageJob.objects.filter(
+                status__in=(ImageJob.FAILED, ImageJob.PROCESSING)
+            ).update(status=ImageJob.PENDING)
+            print('Image jobs queued again: ', retried)
+        counter = 0
+        while True:
+            job = images.claim(ImageJob.objects.all())
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            images.process(job)
+            counter += 1
+        print('Image jobs processed: ', counter)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from recipes import search
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds full-text search data of all recipes'
+
+    def handle(self, *args, **options):
+        counter = 0
+        for recipe_id in Recipe.objects.values_list(
+            'id', flat=True
+        ).iterator():
+            search.index_recipe(recipe_id)
+            counter += 1
+        print('Recipes indexed for search: ', counter)
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import COUNTERS
+
+
+class Command(BaseCommand):
+    help = ('Verifies favourite, shopping list and subscriber counters '
+            'against the join tables or rebuilds them')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recount all counters from join tables')
+
+    def _verify(self):
+        mismatches = 0
+        for counter in COUNTERS:
+            rows = counter.mismatches()
+            for object_id, stored, live in rows:
+                print(f'{counter} of {object_id}: '
+                      f'stored {stored}, expected {live}')
+            mismatches += len(rows)
+        print('Counters mismatches: ', mismatches)
+        return mismatches
+
+    @transaction.atomic
+    def _rebuild(self):
+        for counter in COUNTERS:
+            print(f'{counter} rebuilt: ', counter.rebuild())
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            self._rebuild()
+        elif self._verify():
+            raise SystemExit(1)
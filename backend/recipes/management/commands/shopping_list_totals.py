@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import ShoppingListIngredient
+
+
+class Command(BaseCommand):
+    help = ('Verifies the denormalized shopping list totals against '
+            'the shopping lists or rebuilds them')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recreate all totals from shopping lists')
+
+    def _verify(self):
+        live = {
+            (row['user_id'], row['ingredient_id']): row['amount']
+            for row in ShoppingListIngredient.objects.live_totals()
+        }
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in
+            ShoppingListIngredient.objects.values_list(
+                'user_id', 'ingredient_id', 'amount')
+        }
+        mismatches = [
+            (key, stored.get(key), live.get(key))
+            for key in live.keys() | stored.keys()
+            if stored.get(key) != live.get(key)
+        ]
+        for (user_id, ingredient_id), stored_amount, live_amount in sorted(
+            mismatches, key=lambda item: item[0]
+        ):
+            print(f'user {user_id}, ingredient {ingredient_id}: '
+                  f'stored {stored_amount}, expected {live_amount}')
+        print(f'Shopping list totals checked: {len(live)}, '
+              f'mismatches: {len(mismatches)}')
+        return mismatches
+
+    @transaction.atomic
+    def _rebuild(self):
+        ShoppingListIngredient.objects.all().delete()
+        created = ShoppingListIngredient.objects.bulk_create(
+            ShoppingListIngredient(**row)
+            for row in ShoppingListIngredient.objects.live_totals()
+        )
+        print('Shopping list totals rebuilt: ', len(created))
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            self._rebuild()
+        elif self._verify():
+            raise SystemExit(1)
@@ -0,0 +1,49 @@
+# flake8: noqa
+# Generated by Django 4.2.5 on 2026-10-18 08:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_shopping_list_ingredients(apps, schema_editor):
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    ShoppingListIngredient = apps.get_model('recipes', 'ShoppingListIngredient')
+    totals = IngredientRecipe.objects.filter(
+        recipe__users_shoppinglist__isnull=False
+    ).values(
+        'ingredient_id', user_id=models.F('recipe__users_shoppinglist__user')
+    ).order_by().annotate(amount=models.Sum('amount'))
+    ShoppingListIngredient.objects.bulk_create(
+        ShoppingListIngredient(**row) for row in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Total amount of ingredient')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_totals', to='recipes.ingredient', verbose_name='Ingredient name')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Shopping list ingredient',
+                'verbose_name_plural': 'Shopping list ingredients',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_list_ingredient'),
+        ),
+        migrations.RunPython(fill_shopping_list_ingredients,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# flake8: noqa
+# Generated by Django 4.2.5 on 2026-10-18 08:31
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+POSTGRESQL_FORWARD = (
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector '
+    'ON recipes_recipe USING gin (search_vector)',
+    '''
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector('simple', recipe.name), 'A')
+        || setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_ingredientrecipe AS link
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = link.ingredient_id
+            WHERE link.recipe_id = recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector('simple', recipe.description), 'C')
+    ''',
+)
+POSTGRESQL_BACKWARD = (
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector',
+)
+SQLITE_FORWARD = (
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts
+    USING fts5(name, ingredients, description, tokenize='unicode61')
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_delete
+    AFTER DELETE ON recipes_recipe BEGIN
+        DELETE FROM recipes_recipe_fts WHERE rowid = old.id;
+    END
+    ''',
+    '''
+    INSERT INTO recipes_recipe_fts (rowid, name, ingredients, description)
+    SELECT recipe.id, recipe.name, coalesce((
+        SELECT group_concat(ingredient.name, ' ')
+        FROM recipes_ingredientrecipe AS link
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = link.ingredient_id
+        WHERE link.recipe_id = recipe.id
+    ), ''), recipe.description
+    FROM recipes_recipe AS recipe
+    ''',
+)
+SQLITE_BACKWARD = (
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_delete',
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+)
+
+
+def run_for_vendor(postgresql, sqlite):
+    def run(apps, schema_editor):
+        statements = {'postgresql': postgresql, 'sqlite': sqlite}.get(
+            schema_editor.connection.vendor, ()
+        )
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_ingredient_name_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Search vector'),
+        ),
+        migrations.RunPython(
+            run_for_vendor(POSTGRESQL_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRESQL_BACKWARD, SQLITE_BACKWARD),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# flake8: noqa
+# Generated by Django 4.2.5 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+def count_recipe_users(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for column, model_name in (('favourites_count', 'Favourite'),
+                               ('shopping_lists_count', 'ShoppingList')):
+        model = apps.get_model('recipes', model_name)
+        Recipe.objects.update(**{column: models.functions.Coalesce(
+            models.Subquery(
+                model.objects.filter(recipe=models.OuterRef('pk')).order_by()
+                .values('recipe').annotate(count=models.Count('*'))
+                .values('count')
+            ), 0
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favourites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Times added to favourites'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_lists_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Times added to shopping lists'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favourites_count', '-id'], name='recipe_popular_idx'),
+        ),
+        migrations.RunPython(count_recipe_users, migrations.RunPython.noop),
+    ]
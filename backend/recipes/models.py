@@ -1,11 +1,16 @@
 from colorfield.fields import ColorField
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import (Case, Exists, F, OuterRef, Prefetch, Sum,
+                              Value, When)
+from django.db.models.functions import Greatest
 from django.utils.translation import gettext_lazy as _
 
-from users.models import User
+from users.models import CounterFieldsModel, UniquePairQuerySet, User
 from cookingcrafts.constants import Recipe as R
 
+from .storage import ContentHashStorage
 from .validators import TagSlugValidator
 
 
@@ -65,13 +70,41 @@ class Ingredient(models.Model):
         ]
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        """Loads everything the recipe serializers need in a fixed number
+        of queries, whatever the size of the page."""
+        return self.select_related('author').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('id')),
+            Prefetch('recipe_ingredients',
+                     queryset=IngredientRecipe.objects.select_related(
+                         'ingredient'
+                     )),
+        )
+
+    def with_user_flags(self, user):
+        """Annotates favourite and shopping cart flags for the given user,
+        author subscription comes from users.subscriptions."""
+        if user.is_anonymous:
+            return self.annotate(is_favorited=Value(False),
+                                 is_in_shopping_cart=Value(False))
+        return self.annotate(
+            is_favorited=Exists(Favourite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+        )
+
+
+class Recipe(CounterFieldsModel):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='recipes',
         verbose_name='Author',
         blank=False,
+        db_index=False,
     )
     name = models.CharField(
         _('Recipe name'),
@@ -81,8 +114,15 @@ class Recipe(models.Model):
     image = models.ImageField(
         _('Recipe image'),
         upload_to='recipes/',
+        storage=ContentHashStorage(),
         blank=False
     )
+    image_renditions = models.JSONField(
+        _('Resized copies of the image'),
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     description = models.TextField(
         _('Full description of recipe'),
         blank=False
@@ -106,12 +146,36 @@ class Recipe(models.Model):
                     MaxValueValidator(R.MAX_COOKING_TIME)),
         blank=False,
     )
+    search_vector = SearchVectorField(
+        _('Search vector'),
+        null=True,
+        editable=False,
+    )
+    favourites_count = models.PositiveIntegerField(
+        _('Times added to favourites'),
+        default=0,
+        editable=False,
+    )
+    shopping_lists_count = models.PositiveIntegerField(
+        _('Times added to shopping lists'),
+        default=0,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    counter_fields = ('favourites_count', 'shopping_lists_count')
 
     def __str__(self) -> str:
         return self.name
 
     class Meta:
         ordering = ['-id']
+        indexes = [
+            models.Index(fields=['-favourites_count', '-id'],
+                         name='recipe_popular_idx'),
+            models.Index(fields=['author', '-id'], name='recipe_author_idx'),
+        ]
         verbose_name = _('Recipe')
         verbose_name_plural = _('Recipes')
 
@@ -122,11 +186,13 @@ class IngredientRecipe(models.Model):
         on_delete=models.CASCADE,
         related_name='ingredient_in_recipes',
         verbose_name=_('Ingredient name'),
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
         related_name='recipe_ingredients',
+        db_index=False,
     )
     amount = models.PositiveSmallIntegerField(
         _('Amount of ingredients'),
@@ -138,6 +204,14 @@ class IngredientRecipe(models.Model):
         return f'{self.ingredient} in {self.recipe}'
 
     class Meta:
+        indexes = [
+            # Ingredients of recipes: serializers, shopping list totals
+            models.Index(fields=['recipe', 'ingredient'],
+                         name='ingredient_recipe_recipe_idx'),
+            # Recipes with ingredients: ingredients filter
+            models.Index(fields=['ingredient', 'recipe'],
+                         name='ingredient_recipe_ingr_idx'),
+        ]
         verbose_name = _('Ingredient')
         verbose_name_plural = _('Ingredients')
 
@@ -148,14 +222,19 @@ class UserRecipeAModel(models.Model):
         on_delete=models.CASCADE,
         related_name='%(class)s',
         verbose_name=_('User'),
+        # Covered by the unique (user, recipe) constraint
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
         related_name='users_%(class)s',
         verbose_name=_('%(class) recipe'),
+        db_index=False,
     )
 
+    objects = UniquePairQuerySet.as_manager()
+
     def __str__(self) -> str:
         return f'{self.user} - {self.recipe}'
 
@@ -167,6 +246,11 @@ class UserRecipeAModel(models.Model):
                 name='unique_%(class)s_entry'
             )
         ]
+        indexes = [
+            # Users of a recipe: counters, cascades, removal from carts
+            models.Index(fields=['recipe', 'user'],
+                         name='%(class)s_recipe_user_idx'),
+        ]
 
 
 class Favourite(UserRecipeAModel):
@@ -181,3 +265,174 @@ class ShoppingList(UserRecipeAModel):
     class Meta(UserRecipeAModel.Meta):
         verbose_name = _('Shopping list')
         verbose_name_plural = _('Shopping lists')
+
+
+class ShoppingListIngredientQuerySet(models.QuerySet):
+
+    @staticmethod
+    def recipes_amounts(recipe_ids):
+        """Amounts of ingredients summed over the recipes"""
+        return dict(IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by().values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total'))
+
+    def add_recipes(self, user_id, recipe_ids):
+        self.apply_deltas([user_id], self.recipes_amounts(recipe_ids))
+
+    def remove_recipes(self, user_id, recipe_ids):
+        self.apply_deltas([user_id], {
+            ingredient_id: -amount for ingredient_id, amount
+            in self.recipes_amounts(recipe_ids).items()
+        })
+
+    def change_recipe(self, recipe_id, deltas):
+        """Applies changed amounts of recipe ingredients to every
+        shopping list containing the recipe."""
+        deltas = {key: value for key, value in deltas.items() if value}
+        if not deltas:
+            return
+        user_ids = ShoppingList.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True)
+        self.apply_deltas(list(user_ids), deltas)
+
+    def _add_amounts(self, user_ids, deltas):
+        """
+        INSERT ... ON CONFLICT DO UPDATE adding to the stored amounts,
+        concurrent first adds of an ingredient are summed by the database
+        """
+        meta = self.model._meta
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        table = quote(meta.db_table)
+        user, ingredient, amount = (
+            quote(meta.get_field(name).column)
+            for name in ('user', 'ingredient', 'amount')
+        )
+        rows = [(user_id, ingredient_id, delta) for user_id in user_ids
+                for ingredient_id, delta in deltas.items()]
+        batch_size = connection.ops.bulk_batch_size(
+            ['user', 'ingredient', 'amount'], rows
+        )
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                cursor.execute(
+                    f'INSERT INTO {table} ({user}, {ingredient}, {amount}) '
+                    f'VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                    f'ON CONFLICT ({user}, {ingredient}) DO UPDATE '
+                    f'SET {amount} = {table}.{amount} + EXCLUDED.{amount}',
+                    [value for row in batch for value in row]
+                )
+
+    def _subtract_amounts(self, user_ids, deltas):
+        """One UPDATE for all ingredients, emptied totals are deleted"""
+        rows = self.filter(user_id__in=user_ids,
+                           ingredient_id__in=deltas.keys())
+        rows.update(amount=Greatest(
+            F('amount') + Case(
+                *(When(ingredient_id=ingredient_id, then=Value(delta))
+                  for ingredient_id, delta in deltas.items()),
+                default=Value(0)
+            ),
+            Value(0)
+        ))
+        rows.filter(amount=0).delete()
+
+    @transaction.atomic
+    def apply_deltas(self, user_ids, deltas):
+        if not user_ids or not deltas:
+            return
+        added = {key: delta for key, delta in deltas.items() if delta > 0}
+        if added:
+            self._add_amounts(user_ids, added)
+        removed = {key: delta for key, delta in deltas.items() if delta < 0}
+        if removed:
+            self._subtract_amounts(user_ids, removed)
+
+    def live_totals(self):
+        """The same totals computed from the shopping lists."""
+        return IngredientRecipe.objects.filter(
+            recipe__users_shoppinglist__isnull=False
+        ).values(
+            'ingredient_id', user_id=F('recipe__users_shoppinglist__user')
+        ).order_by().annotate(amount=Sum('amount'))
+
+
+class ShoppingListIngredient(models.Model):
+    """
+    Denormalized shopping list: total amount of every ingredient
+    over all recipes in the user's shopping list
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_ingredients',
+        verbose_name=_('User'),
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_totals',
+        verbose_name=_('Ingredient name'),
+    )
+    amount = models.PositiveIntegerField(
+        _('Total amount of ingredient'),
+    )
+
+    objects = ShoppingListIngredientQuerySet.as_manager()
+
+    def __str__(self) -> str:
+        return f'{self.user} - {self.ingredient}: {self.amount}'
+
+    class Meta:
+        verbose_name = _('Shopping list ingredient')
+        verbose_name_plural = _('Shopping list ingredients')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_ingredient'
+            )
+        ]
+
+
+class ImageJob(models.Model):
+    """Queue of uploaded images waiting for resized copies"""
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = ((PENDING, 'pending'), (PROCESSING, 'processing'),
+                (DONE, 'done'), (FAILED, 'failed'))
+
+    image = models.CharField(
+        _('Image file'),
+        max_length=R.MAX_IMAGE_PATH,
+        unique=True,
+    )
+    status = models.CharField(
+        _('Status'),
+        max_length=R.MAX_IMAGE_JOB_STATUS,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(_('Attempts'), default=0)
+    error = models.TextField(_('Last error'), blank=True)
+    renditions = models.JSONField(_('Resized copies'), default=dict,
+                                  blank=True)
+    created = models.DateTimeField(_('Created'), auto_now_add=True)
+    updated = models.DateTimeField(_('Updated'), auto_now=True)
+
+    def __str__(self) -> str:
+        return f'{self.image} ({self.status})'
+
+    class Meta:
+        indexes = [
+            # Queue of process_images
+            models.Index(fields=['id'], condition=models.Q(status='pending'),
+                         name='image_job_pending_idx'),
+        ]
+        verbose_name = _('Image job')
+        verbose_name_plural = _('Image jobs')
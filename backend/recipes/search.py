@@ -0,0 +1,102 @@
+from threading import local
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import F
+
+SEARCH_CONFIG = 'simple'
+FTS_TABLE = 'recipes_recipe_fts'
+
+POSTGRESQL_INDEX_SQL = f'''
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector('{SEARCH_CONFIG}', recipe.name), 'A')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_ingredientrecipe AS link
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = link.ingredient_id
+            WHERE link.recipe_id = recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', recipe.description), 'C')
+    WHERE recipe.id = %s
+'''
+SQLITE_INDEX_SQL = f'''
+    INSERT INTO {FTS_TABLE} (rowid, name, ingredients, description)
+    SELECT recipe.id, recipe.name, coalesce((
+        SELECT group_concat(ingredient.name, ' ')
+        FROM recipes_ingredientrecipe AS link
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = link.ingredient_id
+        WHERE link.recipe_id = recipe.id
+    ), ''), recipe.description
+    FROM recipes_recipe AS recipe
+    WHERE recipe.id = %s
+'''
+# Name matches weigh more than ingredient ones, description weighs least
+SQLITE_RANK_SQL = f'-bm25({FTS_TABLE}, 10.0, 5.0, 1.0)'
+
+
+def index_recipe(recipe_id):
+    """Updates the search vector of the recipe after it is saved"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(POSTGRESQL_INDEX_SQL, [recipe_id])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [recipe_id])
+            cursor.execute(SQLITE_INDEX_SQL, [recipe_id])
+
+
+_pending = local()
+
+
+def _pending_ids():
+    if not hasattr(_pending, 'ids'):
+        _pending.ids = set()
+    return _pending.ids
+
+
+def _index_pending(recipe_id):
+    pending = _pending_ids()
+    if recipe_id in pending:
+        pending.discard(recipe_id)
+        index_recipe(recipe_id)
+
+
+def schedule_index(recipe_id):
+    """
+    Indexes the recipe after commit, when ingredients written in bulk
+    are in place. Saves of many rows of a recipe index it once
+    """
+    _pending_ids().add(recipe_id)
+    transaction.on_commit(lambda: _index_pending(recipe_id))
+
+
+def fts5_query(query):
+    """Every word is matched as a prefix, all words are required"""
+    return ' '.join('"{}"*'.format(word.replace('"', '""'))
+                    for word in query.split())
+
+
+def search(queryset, query):
+    """Filters recipes by the query and orders them by relevance"""
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(query, config=SEARCH_CONFIG,
+                                   search_type='websearch')
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-id')
+    if connection.vendor == 'sqlite':
+        match = fts5_query(query)
+        if not match:
+            return queryset
+        # FTS5 table can't be joined by ORM, extra() joins it once
+        # instead of running MATCH per recipe in a subquery
+        return queryset.extra(
+            select={'rank': SQLITE_RANK_SQL},
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = recipes_recipe.id',
+                   f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+        ).order_by('-rank', '-id')
+    return queryset.filter(name__icontains=query)
@@ -0,0 +1,216 @@
+from collections import defaultdict
+
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+
+from users.models import User
+from users.signals import pairs_added, pairs_removed
+
+from . import cache, search
+from .counters import COUNTERS
+from .models import (Ingredient, IngredientRecipe, Recipe, ShoppingList,
+                     ShoppingListIngredient, Tag)
+
+for model in (Tag, Ingredient):
+    post_save.connect(cache.invalidate, sender=model)
+    post_delete.connect(cache.invalidate, sender=model)
+    # Slugs filter recipes, names are searched
+    post_save.connect(cache.invalidate_recipes, sender=model)
+    post_delete.connect(cache.invalidate_recipes, sender=model)
+
+# Recipes version changes when a recipe may enter or leave a list,
+# versions of single recipes change with any data shown in them.
+# Fields are the first ones of PREVIOUS_FIELDS
+MATCHED_FIELDS = {
+    Recipe: ('author_id', 'name', 'description'),
+    IngredientRecipe: ('recipe_id', 'ingredient_id'),
+}
+RELATED_RECIPES = {Tag: 'tags', Ingredient: 'ingredients'}
+
+
+def recipe_ids_of(instance):
+    return [getattr(instance, 'recipe_id', instance.pk)]
+
+
+def recipe_saved(sender, instance, **kwargs):
+    fields = MATCHED_FIELDS[sender]
+    previous = instance._previous
+    matched = tuple(getattr(instance, field) for field in fields)
+    if previous is None or previous[:len(fields)] != matched:
+        cache.invalidate_recipes()
+    recipe_ids = recipe_ids_of(instance)
+    if sender is IngredientRecipe and previous is not None:
+        # Moved to another recipe
+        recipe_ids.append(previous[0])
+    cache.invalidate_recipe_versions(recipe_ids)
+
+
+def recipe_deleted(sender, instance, **kwargs):
+    cache.invalidate_recipes()
+    cache.invalidate_recipe_versions(recipe_ids_of(instance))
+
+
+def related_recipe_ids(instance):
+    return list(Recipe.objects.filter(
+        **{RELATED_RECIPES[type(instance)]: instance}
+    ).values_list('id', flat=True))
+
+
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    """Recipes of a cleared tag are looked up before the clear"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    cache.invalidate_recipes()
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == 'pre_clear':
+        recipe_ids = related_recipe_ids(instance)
+    else:
+        recipe_ids = list(pk_set)
+    cache.invalidate_recipe_versions(recipe_ids)
+
+
+def reference_item_changed(sender, instance, **kwargs):
+    """Tags and ingredients are shown in recipes, on delete their recipes
+    are looked up before relations are gone"""
+    cache.invalidate_recipe_versions(related_recipe_ids(instance))
+
+
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    """Authors are shown in recipes, logins and new users change nothing"""
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    cache.invalidate_recipe_versions(list(
+        instance.recipes.values_list('id', flat=True)
+    ))
+
+
+for model in MATCHED_FIELDS:
+    post_save.connect(recipe_saved, sender=model)
+    post_delete.connect(recipe_deleted, sender=model)
+m2m_changed.connect(recipe_tags_changed, sender=Recipe.tags.through)
+for model in (Tag, Ingredient):
+    post_save.connect(reference_item_changed, sender=model)
+    pre_delete.connect(reference_item_changed, sender=model)
+post_save.connect(author_changed, sender=User)
+
+
+def index_recipe(sender, instance, **kwargs):
+    """Deleted recipes are indexed too, it removes them from the index"""
+    search.schedule_index(instance.id)
+
+
+def index_recipe_of_ingredient(sender, instance, **kwargs):
+    search.schedule_index(instance.recipe_id)
+
+
+def index_recipes_of_ingredients(sender, instance, action, reverse, pk_set,
+                                 **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    for recipe_id in (pk_set or ()) if reverse else (instance.id,):
+        search.schedule_index(recipe_id)
+
+
+post_save.connect(index_recipe, sender=Recipe)
+post_delete.connect(index_recipe, sender=Recipe)
+post_save.connect(index_recipe_of_ingredient, sender=IngredientRecipe)
+post_delete.connect(index_recipe_of_ingredient, sender=IngredientRecipe)
+m2m_changed.connect(index_recipes_of_ingredients,
+                    sender=Recipe.ingredients.through)
+
+for counter in COUNTERS:
+    post_save.connect(counter.created, sender=counter.source,
+                      dispatch_uid=f'{counter}.created')
+    post_delete.connect(counter.deleted, sender=counter.source,
+                        dispatch_uid=f'{counter}.deleted')
+    pairs_added.connect(counter.added, sender=counter.source,
+                        dispatch_uid=f'{counter}.added')
+    pairs_removed.connect(counter.removed, sender=counter.source,
+                          dispatch_uid=f'{counter}.removed')
+
+
+# Shopping list totals follow every change of shopping lists and of
+# ingredients of recipes, made by the API, the admin or a cascade.
+# bulk_create and bulk_update send no signals, their callers apply
+# the changed amounts themselves. Stored fields of recipes tell if
+# the recipes version changes
+PREVIOUS_FIELDS = {
+    ShoppingList: ('user_id', 'recipe_id'),
+    IngredientRecipe: ('recipe_id', 'ingredient_id', 'amount'),
+    Recipe: MATCHED_FIELDS[Recipe],
+}
+
+
+def remember_previous(sender, instance, **kwargs):
+    """Stored row replaced by the save"""
+    instance._previous = None
+    if instance.pk is not None:
+        instance._previous = sender.objects.filter(
+            pk=instance.pk
+        ).values_list(*PREVIOUS_FIELDS[sender]).first()
+
+
+def cart_entry_saved(sender, instance, **kwargs):
+    previous = instance._previous
+    if previous == (instance.user_id, instance.recipe_id):
+        return
+    if previous is not None:
+        ShoppingListIngredient.objects.remove_recipes(previous[0],
+                                                      [previous[1]])
+    ShoppingListIngredient.objects.add_recipes(instance.user_id,
+                                               [instance.recipe_id])
+
+
+def cart_entry_deleted(sender, instance, **kwargs):
+    ShoppingListIngredient.objects.remove_recipes(instance.user_id,
+                                                  [instance.recipe_id])
+
+
+def recipes_by_user(instances):
+    recipe_ids = defaultdict(list)
+    for instance in instances:
+        recipe_ids[instance.user_id].append(instance.recipe_id)
+    return recipe_ids.items()
+
+
+def cart_entries_added(sender, instances, **kwargs):
+    for user_id, recipe_ids in recipes_by_user(instances):
+        ShoppingListIngredient.objects.add_recipes(user_id, recipe_ids)
+
+
+def cart_entries_removed(sender, instances, **kwargs):
+    for user_id, recipe_ids in recipes_by_user(instances):
+        ShoppingListIngredient.objects.remove_recipes(user_id, recipe_ids)
+
+
+def recipe_ingredient_saved(sender, instance, **kwargs):
+    deltas = defaultdict(lambda: defaultdict(int))
+    deltas[instance.recipe_id][instance.ingredient_id] += instance.amount
+    if instance._previous is not None:
+        recipe_id, ingredient_id, amount = instance._previous
+        deltas[recipe_id][ingredient_id] -= amount
+    for recipe_id, amounts in deltas.items():
+        ShoppingListIngredient.objects.change_recipe(recipe_id, amounts)
+
+
+def recipe_ingredient_deleted(sender, instance, **kwargs):
+    """
+    Deleting a recipe deletes its shopping list entries and ingredients,
+    whichever goes first takes the amounts out of the totals and the
+    other finds nothing left to subtract
+    """
+    ShoppingListIngredient.objects.change_recipe(
+        instance.recipe_id, {instance.ingredient_id: -instance.amount}
+    )
+
+
+for model in PREVIOUS_FIELDS:
+    pre_save.connect(remember_previous, sender=model)
+post_save.connect(cart_entry_saved, sender=ShoppingList)
+post_delete.connect(cart_entry_deleted, sender=ShoppingList)
+pairs_added.connect(cart_entries_added, sender=ShoppingList)
+pairs_removed.connect(cart_entries_removed, sender=ShoppingList)
+post_save.connect(recipe_ingredient_saved, sender=IngredientRecipe)
+post_delete.connect(recipe_ingredient_deleted, sender=IngredientRecipe)
@@ -0,0 +1,26 @@
+import re
+from pathlib import PurePath
+
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_HASH_NAME = re.compile(r'^[0-9a-f]{64}(-\d+)?$')
+
+
+class ContentHashStorage(FileSystemStorage):
+    """
+    Files named by SHA-256 of their content are stored once,
+    saving the same content again returns the existing file
+    """
+
+    def _is_content_hash(self, name):
+        return bool(CONTENT_HASH_NAME.match(PurePath(name).stem))
+
+    def get_available_name(self, name, max_length=None):
+        if self._is_content_hash(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        if self._is_content_hash(name) and self.exists(name):
+            return name
+        return super()._save(name, content)
@@ -0,0 +1,86 @@
+from django.test import TestCase
+
+from recipes.models import (Ingredient, IngredientRecipe, Recipe,
+                            ShoppingList, ShoppingListIngredient)
+from users.models import User
+
+
+class ShoppingListTotalsTest(TestCase):
+    """Totals follow changes made outside of the API, as in the admin"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create(
+            User(email=f'user{number}@test.local',
+                 username=f'user{number}', first_name='Test',
+                 last_name=f'User{number}')
+            for number in range(2)
+        )
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ingredient {number}', measurement_unit='g')
+            for number in range(4)
+        )
+        cls.recipes = Recipe.objects.bulk_create(
+            Recipe(author=cls.users[0], name=f'Recipe {number}',
+                   description='Test recipe', image='recipes/test.png',
+                   cooking_time=10)
+            for number in range(2)
+        )
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=2)
+            for recipe in cls.recipes for ingredient in cls.ingredients[:2]
+        )
+
+    def setUp(self):
+        for user in self.users:
+            for recipe in self.recipes:
+                ShoppingList.objects.create(user=user, recipe=recipe)
+
+    def assertTotalsMatch(self):
+        live = {
+            (row['user_id'], row['ingredient_id']): row['amount']
+            for row in ShoppingListIngredient.objects.live_totals()
+        }
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in
+            ShoppingListIngredient.objects.values_list(
+                'user_id', 'ingredient_id', 'amount')
+        }
+        self.assertEqual(stored, live)
+
+    def test_added_entry(self):
+        self.assertTotalsMatch()
+        self.assertEqual(ShoppingListIngredient.objects.get(
+            user=self.users[0], ingredient=self.ingredients[0]
+        ).amount, 4)
+
+    def test_deleted_entry(self):
+        ShoppingList.objects.filter(user=self.users[0],
+                                    recipe=self.recipes[0]).delete()
+        self.assertTotalsMatch()
+
+    def test_deleted_recipe(self):
+        self.recipes[0].delete()
+        self.assertTotalsMatch()
+
+    def test_deleted_ingredient(self):
+        self.ingredients[0].delete()
+        self.assertTotalsMatch()
+
+    def test_edited_recipe_ingredients(self):
+        recipe_ingredient = IngredientRecipe.objects.filter(
+            recipe=self.recipes[0]
+        ).first()
+        recipe_ingredient.amount = 5
+        recipe_ingredient.save()
+        self.assertTotalsMatch()
+        recipe_ingredient.ingredient = self.ingredients[3]
+        recipe_ingredient.save()
+        self.assertTotalsMatch()
+        IngredientRecipe.objects.create(recipe=self.recipes[0],
+                                        ingredient=self.ingredients[2],
+                                        amount=3)
+        self.assertTotalsMatch()
+        recipe_ingredient.delete()
+        self.assertTotalsMatch()
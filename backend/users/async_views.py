@@ -0,0 +1,59 @@
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from rest_framework.exceptions import NotAuthenticated
+
+from api.async_views import AsyncReadView
+from api.pagintation import CustomPagination, apaginate
+from recipes.models import Recipe
+
+from .models import User
+from .serializers import SubscribeListSerializer, get_recipes_limit
+from .subscriptions import afollowed_author_ids
+
+
+class SubscriptionsView(AsyncReadView):
+    """CustomUserViewSet.subscriptions with the async ORM"""
+
+    def covers(self, request):
+        mode = request.GET.get(CustomPagination.mode_query_param)
+        return super().covers(request) and mode != 'cursor'
+
+    @staticmethod
+    async def recipes_by_author(author_ids, limit):
+        """First recipes of every author in one query, as the sliced
+        prefetch of the synchronous view does"""
+        recipes = Recipe.objects.filter(author__in=author_ids)
+        if limit is not None:
+            recipes = recipes.annotate(row=Window(
+                RowNumber(), partition_by=F('author_id'),
+                order_by=Recipe._meta.ordering
+            )).filter(row__lte=limit)
+        by_author = {author_id: [] for author_id in author_ids}
+        async for recipe in recipes:
+            by_author[recipe.author_id].append(recipe)
+        return by_author
+
+    async def get(self, request):
+        if request.user.is_anonymous:
+            raise NotAuthenticated
+        limit = get_recipes_limit(request.GET)
+        authors = User.objects.filter(
+            subscribing__user=request.user
+        ).annotate(recipes_count=Count('recipes')).order_by('-id')
+        pagination = await apaginate(authors, request)
+        page = list(pagination.page)
+        # recipes_limit=0 gives empty lists, as the sliced prefetch does
+        recipes = await self.recipes_by_author(
+            [author.id for author in page], limit
+        )
+        for author in page:
+            author.limited_recipes = recipes[author.id]
+        # is_subscribed flags are read from the loaded set
+        await afollowed_author_ids(request)
+        serializer = SubscribeListSerializer(
+            page, context={'request': request, 'user': request.user},
+            many=True
+        )
+        return self.json_response(
+            pagination.get_paginated_response(serializer.data).data
+        )
@@ -0,0 +1,92 @@
+from hashlib import sha256
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db.models.signals import post_delete
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import (TokenAuthentication,
+                                           get_authorization_header)
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.authtoken.models import Token
+
+from cookingcrafts.constants import User as U
+
+from .models import User
+
+
+def token_cache_key(key):
+    # Tokens are credentials, only their hashes are written to the cache
+    return f'auth-token:{sha256(key.encode()).hexdigest()}'
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication with the user id of a key kept in cache, so
+    authenticated requests load the user by primary key and do not look
+    up authtoken_token. Used only with a cache shared by all workers, entries
+    are dropped on logout
+    """
+
+    def authenticate_credentials(self, key):
+        if not settings.AUTH_TOKEN_CACHE:
+            return super().authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        user_id = cache.get(cache_key)
+        if user_id is None:
+            # Invalid tokens and inactive users raise and are not cached
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, user.id, U.AUTH_TOKEN_CACHE_TIMEOUT)
+            return user, token
+        # Loaded on every request, deactivation and other changes
+        # of the user apply at once
+        user = User.objects.filter(id=user_id, is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return user, Token(key=key, user=user)
+
+
+async def aauthenticate(request):
+    """
+    CachedTokenAuthentication for async views. Returns the user of the
+    token header or AnonymousUser, raises AuthenticationFailed
+    """
+    authentication = CachedTokenAuthentication()
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != authentication.keyword.lower().encode():
+        return AnonymousUser()
+    if len(auth) != 2:
+        # Same checks and messages as authenticate(), they raise
+        return await sync_to_async(authentication.authenticate)(request)
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        return await sync_to_async(authentication.authenticate)(request)
+    cache_key = token_cache_key(key)
+    user_id = None
+    if settings.AUTH_TOKEN_CACHE:
+        user_id = await cache.aget(cache_key)
+    if user_id is None:
+        try:
+            token = await Token.objects.select_related('user').aget(key=key)
+        except Token.DoesNotExist:
+            raise AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        if settings.AUTH_TOKEN_CACHE:
+            await cache.aset(cache_key, token.user.id,
+                             U.AUTH_TOKEN_CACHE_TIMEOUT)
+        return token.user
+    user = await User.objects.filter(id=user_id, is_active=True).afirst()
+    if user is None:
+        raise AuthenticationFailed(_('User inactive or deleted.'))
+    return user
+
+
+def forget_token(sender, instance, **kwargs):
+    cache.delete(token_cache_key(instance.key))
+
+
+# djoser logout deletes the token, deleting a user deletes its token
+post_delete.connect(forget_token, sender=Token)
@@ -0,0 +1,31 @@
+# flake8: noqa
+# Generated by Django 4.2.5 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+def count_subscribers(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Subscribe = apps.get_model('users', 'Subscribe')
+    User.objects.update(subscribers_count=models.functions.Coalesce(
+        models.Subquery(
+            Subscribe.objects.filter(author=models.OuterRef('pk')).order_by()
+            .values('author').annotate(count=models.Count('*')).values('count')
+        ), 0
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Number of subscribers'),
+        ),
+        migrations.RunPython(count_subscribers, migrations.RunPython.noop),
+    ]
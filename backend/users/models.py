@@ -1,12 +1,36 @@
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
-from django.db import models
+from django.db import connections, models
 from django.utils.translation import gettext_lazy as _
 
 from cookingcrafts.constants import User as U
 
+from .signals import pairs_added, pairs_removed
 
-class User(AbstractUser):
+
+class CounterFieldsModel(models.Model):
+    """
+    Model with counter columns changed only by recipes.counters.
+    Saving a loaded object must not overwrite concurrent counter updates
+    """
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CounterFieldsModel, AbstractUser):
     ADMIN = 'admin'
     USER = 'user'
     BASE_ROLES = ((ADMIN, 'admin'), (USER, 'user'))
@@ -40,9 +64,14 @@ class User(AbstractUser):
     role = models.CharField(_("User Role"), choices=BASE_ROLES,
                             default=USER,
                             max_length=U.MAX_ROLE_NAME)
+    subscribers_count = models.PositiveIntegerField(
+        _("Number of subscribers"), default=0, editable=False
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ["username", "first_name", "last_name"]
 
+    counter_fields = ('subscribers_count',)
+
     def __str__(self) -> str:
         return self.username
 
@@ -55,20 +84,106 @@ class User(AbstractUser):
         verbose_name_plural = _('CookingCrafts Craftsmans')
 
 
+class UniquePairQuerySet(models.QuerySet):
+    """
+    Rows unique by a pair of foreign keys, like favourites or
+    subscriptions. Adding and removing is a single statement, the unique
+    constraint decides instead of a check made before the write.
+    Written rows are sent with pairs_added and pairs_removed
+    """
+
+    def _pair(self):
+        meta = self.model._meta
+        constraint, = (constraint for constraint in meta.constraints
+                       if isinstance(constraint, models.UniqueConstraint))
+        return [meta.get_field(name) for name in constraint.fields]
+
+    def target_field(self):
+        """Foreign key of the pair the rows are added to or removed from"""
+        return self._pair()[1]
+
+    def _write(self, sql, owner_id, target_ids, signal):
+        owner, target = self._pair()
+        meta = self.model._meta
+        quote = connections[self.db].ops.quote_name
+        target_ids = list(target_ids)
+        if not target_ids:
+            return []
+        placeholders = ', '.join(['%s'] * len(target_ids))
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql.format(
+                table=quote(meta.db_table), owner=quote(owner.column),
+                target=quote(target.column), pk=quote(meta.pk.column),
+                ids=placeholders
+            ), [owner_id, *target_ids])
+            rows = cursor.fetchall()
+        instances = []
+        for pk, target_id in rows:
+            instance = self.model(**{meta.pk.attname: pk,
+                                     owner.attname: owner_id,
+                                     target.attname: target_id})
+            instance._state.adding = False
+            instance._state.db = self.db
+            instances.append(instance)
+        if instances:
+            signal.send(sender=self.model, instances=instances,
+                        using=self.db)
+        return instances
+
+    def add_many(self, owner_id, target_ids):
+        """
+        INSERT ... ON CONFLICT DO NOTHING of the pairs, missing targets
+        are skipped. Returns the inserted rows
+        """
+        related = self.target_field().related_model._meta
+        quote = connections[self.db].ops.quote_name
+        related_pk = quote(related.pk.column)
+        return self._write(
+            'INSERT INTO {table} ({owner}, {target}) '
+            f'SELECT %s, {related_pk} FROM {quote(related.db_table)} '
+            f'WHERE {related_pk} IN ({{ids}}) ON CONFLICT DO NOTHING '
+            'RETURNING {pk}, {target}',
+            owner_id, target_ids, pairs_added
+        )
+
+    def remove_many(self, owner_id, target_ids):
+        """DELETE ... RETURNING of the pairs. Returns the deleted rows"""
+        return self._write(
+            'DELETE FROM {table} WHERE {owner} = %s '
+            'AND {target} IN ({ids}) RETURNING {pk}, {target}',
+            owner_id, target_ids, pairs_removed
+        )
+
+    def add(self, owner_id, target_id):
+        """The new row or None if it was not inserted"""
+        added = self.add_many(owner_id, [target_id])
+        return added[0] if added else None
+
+    def remove(self, owner_id, target_id):
+        """The deleted row or None if there was nothing to delete"""
+        removed = self.remove_many(owner_id, [target_id])
+        return removed[0] if removed else None
+
+
 class Subscribe(models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='subscriber',
-        verbose_name='Fan'
+        verbose_name='Fan',
+        # Covered by the unique (user, author) constraint
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='subscribing',
-        verbose_name='Content Creator'
+        verbose_name='Content Creator',
+        db_index=False,
     )
 
+    objects = UniquePairQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -76,6 +191,11 @@ class Subscribe(models.Model):
                 name='unique_subscription'
             )
         ]
+        indexes = [
+            # Subscribers of an author: counters, is_subscribed flags
+            models.Index(fields=['author', 'user'],
+                         name='subscribe_author_user_idx'),
+        ]
         verbose_name = _('Subscription')
         verbose_name_plural = _('Subscriptions')
 
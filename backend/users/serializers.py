@@ -1,13 +1,12 @@
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
-from rest_framework.validators import (UniqueTogetherValidator,
-                                       UniqueValidator,
-                                       ValidationError)
+from rest_framework.validators import UniqueValidator
 
 from api.commomserializers import ShortRecipeSerializer
 from cookingcrafts.constants import User as U
 
-from .models import Subscribe, User
+from .models import User
+from .subscriptions import is_subscribed
 
 
 class CustomUserSerializer(UserSerializer):
@@ -30,9 +29,18 @@ class CustomUserSerializer(UserSerializer):
         model = User
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        return (not user.is_anonymous
-                and obj.subscribing.filter(user=user).exists())
+        return is_subscribed(self.context, obj)
+
+
+def get_recipes_limit(query_params):
+    """recipes_limit query parameter, None if it is not given"""
+    limit = query_params.get('recipes_limit')
+    if not limit:
+        return None
+    try:
+        return serializers.IntegerField(min_value=0).run_validation(limit)
+    except serializers.ValidationError as error:
+        raise serializers.ValidationError({'recipes_limit': error.detail})
 
 
 class SubscribeListSerializer(serializers.ModelSerializer):
@@ -47,45 +55,18 @@ class SubscribeListSerializer(serializers.ModelSerializer):
         read_only_fields = ('__all__',)
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('user')
-        return (not user.is_anonymous
-                and obj.subscribing.filter(user=user).exists())
+        return is_subscribed(self.context, obj)
 
     def get_recipes(self, obj):
-        limit = self.context.get('request').query_params.get('recipes_limit')
+        if hasattr(obj, 'limited_recipes'):
+            return ShortRecipeSerializer(obj.limited_recipes, many=True).data
+        limit = get_recipes_limit(self.context.get('request').query_params)
         author_recipes = obj.recipes.all()
-        if limit:
-            author_recipes = author_recipes[:int(limit)]
+        if limit is not None:
+            author_recipes = author_recipes[:limit]
         return ShortRecipeSerializer(author_recipes, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.all().count()
-
-
-class SubscribeSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        fields = ('author', 'user')
-        model = Subscribe
-        validators = [UniqueTogetherValidator(
-            queryset=Subscribe.objects.all(),
-            fields=('user', 'author'),
-            message='Subscription already exists!')]
-
-    def validate(self, data):
-        if data.get('user').id == data.get('author').id:
-            raise ValidationError(
-                'You cannot subscribe to yourself!'
-            )
-        return data
-
-    def create(self, validated_data):
-        author = validated_data.get('author')
-        user = validated_data.get('user')
-        return Subscribe.objects.create(user=user, author=author)
-
-    def to_representation(self, instance):
-        context = {'request': self.context.get('request'),
-                   'user': instance.user}
-        return SubscribeListSerializer(instance=instance.author,
-                                       context=context).data
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent by UniquePairQuerySet with the rows of one statement:
+# sender, instances, using
+pairs_added = Signal()
+pairs_removed = Signal()
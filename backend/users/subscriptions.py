@@ -0,0 +1,48 @@
+from .models import Subscribe
+
+FOLLOWED_ATTRIBUTE = '_followed_author_ids'
+
+
+def followed_author_ids(request):
+    """
+    Ids of authors followed by the requesting user. Loaded with one query
+    on first use and kept on the request, so every is_subscribed flag
+    of a response is a set lookup.
+    """
+    if request is None or request.user.is_anonymous:
+        return frozenset()
+    user = request.user
+    # Same set for DRF request and the Django request it wraps
+    request = getattr(request, '_request', request)
+    followed = getattr(request, FOLLOWED_ATTRIBUTE, None)
+    if followed is None:
+        followed = frozenset(Subscribe.objects.filter(
+            user=user
+        ).values_list('author_id', flat=True))
+        setattr(request, FOLLOWED_ATTRIBUTE, followed)
+    return followed
+
+
+async def afollowed_author_ids(request):
+    """followed_author_ids for async views, kept on the same request"""
+    if request.user.is_anonymous:
+        return frozenset()
+    followed = getattr(request, FOLLOWED_ATTRIBUTE, None)
+    if followed is None:
+        followed = frozenset([author_id async for author_id in
+                              Subscribe.objects.filter(
+                                  user=request.user
+                              ).values_list('author_id', flat=True)])
+        setattr(request, FOLLOWED_ATTRIBUTE, followed)
+    return followed
+
+
+def is_subscribed(context, author):
+    """Flag for the context user, the requesting user by default"""
+    request = context.get('request')
+    user = context.get('user', request.user if request else None)
+    if user is None or user.is_anonymous:
+        return False
+    if request is None or user.id != request.user.id:
+        return Subscribe.objects.filter(user=user, author=author).exists()
+    return author.id in followed_author_ids(request)
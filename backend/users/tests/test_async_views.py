@@ -0,0 +1,77 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory, TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.async_views import SubscriptionsView
+from users.models import Subscribe, User
+from users.views import CustomUserViewSet
+
+URL = '/api/users/subscriptions/'
+
+
+class SubscriptionsViewTest(TestCase):
+    """Async subscriptions answer as CustomUserViewSet.subscriptions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = User.objects.bulk_create(
+            User(email=f'author{number}@test.local',
+                 username=f'author{number}', first_name='Test',
+                 last_name=f'Author{number}')
+            for number in range(3)
+        )
+        user = User.objects.create(email='user@test.local', username='user',
+                                   first_name='Test', last_name='User')
+        Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Recipe {number}',
+                   description='Test recipe', image='recipes/test.png',
+                   cooking_time=10)
+            for author in authors for number in range(3)
+        )
+        Subscribe.objects.bulk_create(
+            Subscribe(user=user, author=author) for author in authors
+        )
+        cls.token = Token.objects.create(user=user)
+        cls.view = SubscriptionsView.as_view(
+            sync_view=CustomUserViewSet.as_view({'get': 'subscriptions'})
+        )
+
+    def sync_response(self, query, status=200):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        response = client.get(URL, query)
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def async_response(self, query, status=200):
+        request = AsyncRequestFactory().get(
+            URL, query, headers={'Authorization': f'Token {self.token.key}'}
+        )
+        response = async_to_sync(self.view)(request)
+        self.assertEqual(response.status_code, status)
+        return json.loads(response.content)
+
+    def test_same_response(self):
+        for query in ({}, {'recipes_limit': 0}, {'recipes_limit': 2},
+                      {'limit': 2, 'page': 2}):
+            with self.subTest(query=query):
+                self.assertEqual(self.async_response(query),
+                                 self.sync_response(query))
+
+    def test_zero_recipes_limit(self):
+        response = self.async_response({'recipes_limit': 0})
+        self.assertEqual(
+            [author['recipes'] for author in response['results']],
+            [[], [], []]
+        )
+
+    def test_invalid_recipes_limit(self):
+        for limit in ('-1', 'abc', '1.5'):
+            with self.subTest(limit=limit):
+                query = {'recipes_limit': limit}
+                self.assertEqual(self.async_response(query, status=400),
+                                 self.sync_response(query, status=400))
@@ -0,0 +1,50 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from users.authentication import token_cache_key
+from users.models import User
+
+URL = '/api/users/me/'
+
+
+@override_settings(AUTH_TOKEN_CACHE=True)
+class CachedTokenAuthenticationTest(TestCase):
+    """Only the user id is cached, the user is loaded on every request"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email='user@test.local',
+                                        username='user', first_name='Test',
+                                        last_name='User')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cached_user_id(self):
+        self.assertEqual(self.client.get(URL).status_code, 200)
+        self.assertEqual(cache.get(token_cache_key(self.token.key)),
+                         self.user.id)
+        self.user.first_name = 'Changed'
+        self.user.save()
+        response = self.client.get(URL)
+        self.assertEqual(response.data['first_name'], 'Changed')
+
+    def test_deactivated_user(self):
+        self.assertEqual(self.client.get(URL).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(URL).status_code, 401)
+
+    def test_logout(self):
+        self.assertEqual(self.client.get(URL).status_code, 200)
+        key = self.token.key
+        self.token.delete()
+        self.assertIsNone(cache.get(token_cache_key(key)))
+        self.assertEqual(self.client.get(URL).status_code, 401)
+
+    @override_settings(AUTH_TOKEN_CACHE=False)
+    def test_process_local_cache(self):
+        self.assertEqual(self.client.get(URL).status_code, 200)
+        self.assertIsNone(cache.get(token_cache_key(self.token.key)))
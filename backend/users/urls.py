@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
@@ -11,3 +12,13 @@ urlpatterns = [
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken'))
 ]
+
+if settings.ASYNC_VIEWS:
+    from .async_views import SubscriptionsView
+
+    # Matched first, other requests are passed to CustomUserViewSet
+    sync_views = {url.name: url.callback for url in router.urls}
+    urlpatterns.insert(0, path(
+        'users/subscriptions/',
+        SubscriptionsView.as_view(sync_view=sync_views['users-subscriptions'])
+    ))
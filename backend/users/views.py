@@ -1,21 +1,27 @@
+from django.db import transaction
+from django.db.models import Count, Prefetch, prefetch_related_objects
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
 from api import pagintation
+from api.mixins import PairBatchMixin
+from recipes.models import Recipe
 
 from .models import Subscribe, User
 from .serializers import (CustomUserSerializer, SubscribeListSerializer,
-                          SubscribeSerializer)
+                          get_recipes_limit)
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(PairBatchMixin, UserViewSet):
     serializer_class = CustomUserSerializer
     queryset = User.objects.all()
     pagination_class = pagintation.CustomPagination
+    lookup_value_regex = r'\d+'
 
     @action(['get'], detail=False,
             permission_classes=(IsAuthenticated,))
@@ -26,39 +32,70 @@ class CustomUserViewSet(UserViewSet):
             url_path=r'subscribe',
             permission_classes=(IsAuthenticated,))
     def subscribe(self, request, id):
+        """One INSERT, the unique constraint rejects duplicates"""
         user = request.user
-        author = get_object_or_404(User, id=id)
-        serializer = SubscribeSerializer(
-            context={'request': request},
-            data={'user': user.id,
-                  'author': author.id})
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        # Checked before the subscription is written
+        get_recipes_limit(request.query_params)
+        if user.id == int(id):
+            return Response({api_settings.NON_FIELD_ERRORS_KEY: [
+                'You cannot subscribe to yourself!'
+            ]}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            subscription = Subscribe.objects.add(user.id, id)
+        if subscription is None:
+            get_object_or_404(User.objects.only('id'), id=id)
+            return Response({api_settings.NON_FIELD_ERRORS_KEY: [
+                'Subscription already exists!'
+            ]}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = SubscribeListSerializer(
+            subscription.author,
+            context={'request': request,
+                     'user': user})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
     def subscribtion_delete(self, request, id):
-        user = request.user
-        author = get_object_or_404(User, id=id)
-        if User.objects.filter(id=author.id).exists():
-            if not Subscribe.objects.filter(
-                user=user.id, author=author.id
-            ).exists():
-                return Response({"detail': Subscription doesn't exists"},
-                                status=status.HTTP_400_BAD_REQUEST)
-        subscription = get_object_or_404(
-            Subscribe, user=user.id, author=author.id)
-        subscription.delete()
+        """One DELETE ... RETURNING"""
+        with transaction.atomic():
+            subscription = Subscribe.objects.remove(request.user.id, id)
+        if subscription is None:
+            get_object_or_404(User.objects.only('id'), id=id)
+            return Response({'detail': "Subscription doesn't exists"},
+                            status=status.HTTP_400_BAD_REQUEST)
         return Response({'detail': 'Subscription was deleted'},
                         status=status.HTTP_204_NO_CONTENT)
 
+    @action(['post'], detail=False,
+            url_path=r'subscribe', url_name='subscribe-batch',
+            permission_classes=(IsAuthenticated,))
+    def subscribe_batch(self, request):
+        """{"ids": [...]} of authors to subscribe to"""
+        return self.batch_response(Subscribe, add=True,
+                                   invalid={request.user.id})
+
+    @subscribe_batch.mapping.delete
+    def subscribe_batch_delete(self, request):
+        return self.batch_response(Subscribe, add=False)
+
     @action(['get'], detail=False,
             url_path=r'subscriptions',
             permission_classes=(IsAuthenticated,),
             pagination_class=pagintation.CustomPagination)
     def subscriptions(self, request):
-        authors = User.objects.filter(subscribing__user=request.user)
+        limit = get_recipes_limit(request.query_params)
+        authors = User.objects.filter(
+            subscribing__user=request.user
+        ).annotate(recipes_count=Count('recipes')).order_by('-id')
         paginated_authors = self.paginate_queryset(authors)
+        recipes = Recipe.objects.all()
+        if limit is not None:
+            # Sliced prefetch takes first recipes of every author
+            # in one query using ROW_NUMBER() partitioned by author
+            recipes = recipes[:limit]
+        prefetch_related_objects(
+            paginated_authors,
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        )
         serializer = SubscribeListSerializer(
             paginated_authors,
             context={'request': request,